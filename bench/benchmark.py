@@ -0,0 +1,110 @@
+"""
+Benchmark đường đăng bài (PostingEngine + router + providers) với server giả lập, không gọi service thật.
+
+    python -m bench.benchmark --sizes 100 1000 10000 --concurrency 8
+    python -m bench.benchmark --scenario dpaste_down --sizes 1000
+
+Báo cáo cho mỗi kích thước sheet: số dòng/giây, độ trễ p50/p95/p99 của từng dòng
+và độ sâu fallback (số provider phải gọi trước khi thành công).
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import providers  # noqa: E402
+from engine import PostingEngine, rate_limiter, DEFAULT_RATE_LIMITS  # noqa: E402
+from routing import router  # noqa: E402
+from bench.stub_server import StubServer  # noqa: E402
+
+# Các kịch bản lỗi provider
+SCENARIOS = {
+    "healthy": {},
+    "dpaste_down": {"dpaste": "500"},
+    "dpaste_slow": {"dpaste": "slow"},
+    "rentry_blocked": {"dpaste": "500", "rentry_api": "403", "rentry": "403"},
+    "nonjson": {"dpaste": "nonjson", "rentry_api": "nonjson"},
+    "only_pastebin": {"dpaste": "500", "rentry_api": "500", "rentry": "500", "0x0.st": "500"},
+    "rate_limited": {"dpaste": "429"},
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def run_once(rows: int, concurrency: int, chain) -> Dict[str, Any]:
+    """Đăng `rows` dòng qua PostingEngine, đo độ trễ và độ sâu fallback từng dòng"""
+    def post(item):
+        started = time.perf_counter()
+        result = providers.post_rentry(item, chain=chain)
+        return result, time.perf_counter() - started
+
+    contents = (f"Benchmark row {i} - " + "nội dung mẫu " * 20 for i in range(rows))
+    engine = PostingEngine(post, concurrency=concurrency)
+
+    latencies, depths, success = [], [], 0
+    started = time.perf_counter()
+    for _, (result, latency) in engine.run(contents):
+        latencies.append(latency)
+        depths.append(len(result.get("tried", [])))
+        success += "url" in result
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "rows_per_s": rows / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "avg_depth": statistics.mean(depths) if depths else 0.0,
+        "max_depth": max(depths) if depths else 0,
+        "success_pct": 100.0 * success / rows if rows else 0.0,
+        "elapsed_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline đường đăng bài")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="healthy")
+    parser.add_argument("--slow-delay", type=float, default=0.2)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Giữ giới hạn tốc độ mặc định của provider (mặc định tắt để đo thông lượng thuần)")
+    parser.add_argument("--with-selenium", action="store_true", help="Giữ bước Selenium trong chuỗi provider")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    chain = [step for step in providers.PROVIDER_CHAIN if args.with_selenium or step[0] != "selenium"]
+    for provider, (rate, burst) in DEFAULT_RATE_LIMITS.items():
+        rate_limiter.configure(provider, rate if args.rate_limit else 0, burst)
+
+    print(f"Kịch bản: {args.scenario}, concurrency {args.concurrency}")
+    print(f"{'rows':>7} {'rows/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'depth':>6} {'max':>4} {'ok %':>6}")
+    with StubServer(SCENARIOS[args.scenario], args.slow_delay) as server:
+        providers.configure_endpoints(server.endpoints())
+        try:
+            for rows in args.sizes:
+                router.reset()
+                report = run_once(rows, args.concurrency, chain)
+                print(f"{report['rows']:>7} {report['rows_per_s']:>9.1f} {report['p50_ms']:>8.1f} "
+                      f"{report['p95_ms']:>8.1f} {report['p99_ms']:>8.1f} {report['avg_depth']:>6.2f} "
+                      f"{report['max_depth']:>4} {report['success_pct']:>6.1f}")
+        finally:
+            providers.configure_endpoints()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Server giả lập các paste provider (dpaste, rentry, 0x0.st, pastebin) để đo hiệu năng offline.
+
+Chạy riêng:
+    python -m bench.stub_server --port 8765 --mode dpaste=500 --mode rentry_api=403
+
+rồi trỏ app tới server giả lập:
+    RENTRY_ENDPOINTS='{"dpaste": "http://127.0.0.1:8765/dpaste/api/v2/", ...}' streamlit run rentry.py
+
+Mỗi provider có một chế độ phản hồi:
+    ok       - thành công như provider thật
+    403/500  - trả về status tương ứng
+    nonjson  - status 200 nhưng body là HTML (không đúng định dạng provider)
+    slow     - chờ `slow_delay` giây rồi trả về thành công
+    429      - Too Many Requests kèm Retry-After: 1
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+MODES = ["ok", "403", "500", "nonjson", "slow", "429"]
+PROVIDERS = ["dpaste", "rentry", "rentry_api", "0x0.st", "pastebin"]
+
+# Đường dẫn của từng provider trên server giả lập
+PATHS = {
+    "dpaste": "/dpaste/api/v2/",
+    "rentry": "/rentry",
+    "rentry_api": "/rentry/api/new",
+    "0x0.st": "/0x0",
+    "pastebin": "/pastebin/api/api_post.php",
+}
+
+
+class StubState:
+    """Cấu hình chế độ phản hồi và nội dung đã đăng (để GET lại URL)"""
+
+    def __init__(self, modes: Optional[Dict[str, str]] = None, slow_delay: float = 0.5):
+        self.lock = threading.Lock()
+        self.modes = {provider: "ok" for provider in PROVIDERS}
+        self.modes.update(modes or {})
+        self.slow_delay = slow_delay
+        self.pastes: Dict[str, str] = {}
+        self.hits: Dict[str, int] = {provider: 0 for provider in PROVIDERS}
+
+    def store(self, content: str) -> str:
+        paste_id = uuid.uuid4().hex[:10]
+        with self.lock:
+            self.pastes[paste_id] = content
+        return paste_id
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubPaste/1.0"
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "text/plain", headers: Optional[Dict[str, str]] = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_form(self) -> Dict[str, str]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            # Chỉ cần lấy phần dữ liệu của field đầu tiên (upload file của 0x0.st)
+            boundary = content_type.split("boundary=", 1)[-1].encode()
+            for part in raw.split(b"--" + boundary):
+                if b"\r\n\r\n" in part:
+                    _, payload = part.split(b"\r\n\r\n", 1)
+                    return {"file": payload.rstrip(b"\r\n").decode("utf-8", "replace")}
+            return {}
+        form = parse_qs(raw.decode("utf-8", "replace"), keep_blank_values=True)
+        return {key: values[0] for key, values in form.items()}
+
+    def _base(self) -> str:
+        return f"http://{self.headers.get('Host')}"
+
+    def _failure(self, provider: str) -> bool:
+        """Áp dụng chế độ lỗi của provider, trả về True nếu đã gửi phản hồi lỗi"""
+        with self.state.lock:
+            self.state.hits[provider] += 1
+            mode = self.state.modes.get(provider, "ok")
+        if mode == "slow":
+            time.sleep(self.state.slow_delay)
+            return False
+        if mode in ("403", "500"):
+            self._send(int(mode), f"<html>{mode}</html>", "text/html")
+            return True
+        if mode == "429":
+            self._send(429, "Too Many Requests", headers={"Retry-After": "1"})
+            return True
+        if mode == "nonjson":
+            self._send(200, "<html><body>Checking your browser...</body></html>", "text/html")
+            return True
+        return False
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == PATHS["rentry"]:
+            self._send(200, "<html><form><textarea name='text'></textarea></form></html>", "text/html")
+            return
+        # Xem lại bài đã đăng: /<provider>/<id>, /<id>.txt, /<id>/raw ...
+        match = re.search(r"/([0-9a-f]{10})(?:\.txt|/raw)?$", path)
+        if match and match.group(1) in self.state.pastes:
+            self._send(200, self.state.pastes[match.group(1)])
+            return
+        self._send(404, "Not Found")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        form = self._read_form()
+        base = self._base()
+
+        if path == PATHS["dpaste"]:
+            if not self._failure("dpaste"):
+                paste_id = self.state.store(form.get("content", ""))
+                self._send(201, f"{base}/dpaste/{paste_id}\n")
+        elif path == PATHS["rentry_api"]:
+            if not self._failure("rentry_api"):
+                paste_id = self.state.store(form.get("text", ""))
+                body = json.dumps({"status": "200", "url": f"{base}/rentry/{paste_id}", "edit_code": "stub"})
+                self._send(200, body, "application/json")
+        elif path.rstrip("/") in (PATHS["rentry"], PATHS["rentry"] + "/new"):
+            if not self._failure("rentry"):
+                paste_id = self.state.store(form.get("text", ""))
+                self._send(200, f"<html><a href='{base}/rentry/{paste_id}'>{base}/rentry/{paste_id}</a></html>", "text/html")
+        elif path.rstrip("/") == PATHS["0x0.st"]:
+            if not self._failure("0x0.st"):
+                paste_id = self.state.store(form.get("file", ""))
+                self._send(200, f"{base}/0x0/{paste_id}.txt\n")
+        elif path == PATHS["pastebin"]:
+            if not self._failure("pastebin"):
+                paste_id = self.state.store(form.get("api_paste_code", ""))
+                self._send(200, f"{base}/pastebin/{paste_id}")
+        else:
+            self._send(404, "Not Found")
+
+
+class StubServer:
+    """Server giả lập chạy trong một thread nền"""
+
+    def __init__(self, modes: Optional[Dict[str, str]] = None, slow_delay: float = 0.5,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = StubState(modes, slow_delay)
+        self._thread = None
+
+    @property
+    def state(self) -> StubState:
+        return self.httpd.state
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def endpoints(self) -> Dict[str, str]:
+        """Endpoint dùng cho providers.configure_endpoints()"""
+        return {provider: self.base_url + path for provider, path in PATHS.items()}
+
+    def set_modes(self, modes: Dict[str, str]) -> None:
+        with self.state.lock:
+            self.state.modes.update(modes)
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def parse_modes(values) -> Dict[str, str]:
+    modes = {}
+    for value in values or []:
+        provider, _, mode = value.partition("=")
+        if provider not in PROVIDERS or mode not in MODES:
+            raise argparse.ArgumentTypeError(f"--mode không hợp lệ: {value} (provider={PROVIDERS}, mode={MODES})")
+        modes[provider] = mode
+    return modes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server giả lập các paste provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", action="append", help="provider=mode, vd. dpaste=500 (có thể lặp lại)")
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = StubServer(parse_modes(args.mode), args.slow_delay, args.host, args.port)
+    print("RENTRY_ENDPOINTS='" + json.dumps(server.endpoints()) + "'")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
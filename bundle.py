@@ -0,0 +1,63 @@
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Gộp tối đa chừng này dòng hợp lệ liên tiếp vào một bài (0 hoặc 1 = tắt)
+DEFAULT_BUNDLE_ROWS = int(os.environ.get("RENTRY_BUNDLE_ROWS", "0"))
+# Kích thước tối đa (byte UTF-8) của một bài gộp, dưới giới hạn của dpaste / rentry
+DEFAULT_BUNDLE_BYTES = int(os.environ.get("RENTRY_BUNDLE_BYTES", "100000"))
+BUNDLE_ROWS = DEFAULT_BUNDLE_ROWS
+BUNDLE_BYTES = DEFAULT_BUNDLE_BYTES
+
+# Mỗi dòng là một heading Markdown, rentry tạo anchor #row-N cho heading đó
+# (provider văn bản thuần vẫn giữ heading để tách dòng, nhưng link không có anchor)
+HEADING_RE = re.compile(r"^## (row-\d+)[ \t]*$", re.MULTILINE)
+
+
+def configure(rows: int, max_bytes: int = DEFAULT_BUNDLE_BYTES) -> None:
+    global BUNDLE_ROWS, BUNDLE_BYTES
+    BUNDLE_ROWS = max(0, int(rows))
+    BUNDLE_BYTES = max(1, int(max_bytes))
+
+
+def anchor(idx: int) -> str:
+    return f"row-{idx + 1}"
+
+
+def section(idx: int, content: str) -> str:
+    return f"## {anchor(idx)}\n\n{content}"
+
+
+def render(rows: Iterable[Tuple[int, str]]) -> str:
+    """Nội dung bài gộp từ các (chỉ số dòng, content)"""
+    return "\n\n".join(section(idx, content) for idx, content in rows) + "\n"
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """Ngược lại của render(): anchor -> content của dòng đó"""
+    parts = HEADING_RE.split(text.replace("\r\n", "\n"))
+    return {parts[i]: parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+
+
+def iter_bundles(items: Iterable[Tuple], max_rows: int, max_bytes: int) -> Iterator[List[Tuple]]:
+    """
+    Gom các dòng (chỉ số, content, hợp lệ, ...) hợp lệ liên tiếp thành từng nhóm tối đa `max_rows` dòng
+    và `max_bytes` byte sau khi render. Dòng không hợp lệ, dòng quá lớn và dòng của file khác
+    (phần tử thứ 5 của BatchRow) làm ngắt nhóm; dòng không hợp lệ luôn đứng riêng.
+    """
+    bundle: List[Tuple] = []
+    size = 0
+    for item in items:
+        idx, content, valid = item[:3]
+        cost = len(section(idx, content).encode("utf-8")) + 2
+        if bundle and (not valid or len(bundle) >= max_rows or size + cost > max_bytes
+                       or item[4:5] != bundle[0][4:5]):
+            yield bundle
+            bundle, size = [], 0
+        if not valid:
+            yield [item]
+            continue
+        bundle.append(item)
+        size += cost
+    if bundle:
+        yield bundle
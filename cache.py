@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator, List
+
+from journal import STATE_DIR, connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600.0  # giây
+DEFAULT_MAX_ENTRIES = 100_000
+EVICT_EVERY = 100  # dọn cache sau mỗi N lần ghi
+
+
+def content_hash(content: str) -> str:
+    """Hash của content sau khi chuyển đổi (đúng nội dung sẽ được đăng)"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache kết quả đăng bài theo (hash content, provider) trên SQLite,
+    có TTL và giới hạn kích thước (loại bỏ theo LRU).
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(STATE_DIR, "cache.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        # Khóa theo content đang được đăng: [lock, số luồng đang giữ / chờ], bỏ khi không còn ai dùng
+        self._key_locks: Dict[str, List] = {}
+        self._conn = connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " content_hash TEXT NOT NULL,"
+            " provider TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, provider))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._conn.commit()
+
+    def configure(self, ttl: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        if ttl is not None:
+            self.ttl = float(ttl)
+        if max_entries is not None:
+            self.max_entries = int(max_entries)
+            with self._lock:
+                self._evict()
+
+    def get(self, content: str) -> Optional[Dict[str, Any]]:
+        """Kết quả mới nhất còn hạn của content (ở bất kỳ provider nào)"""
+        key = content_hash(content)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT provider, result FROM entries WHERE content_hash = ? AND created_at >= ?"
+                " ORDER BY created_at DESC LIMIT 1",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE content_hash = ? AND provider = ?",
+                (now, key, row[0]),
+            )
+            self._conn.commit()
+        return json.loads(row[1])
+
+    def put(self, content: str, result: Dict[str, Any]) -> None:
+        """Lưu kết quả thành công (có url) của content"""
+        if "url" not in result:
+            return
+        now = time.time()
+        provider = result.get("method", "unknown")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (content_hash, provider, result, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (content_hash(content), provider, json.dumps(result, ensure_ascii=False, default=str), now, now),
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def discard(self, content: str) -> None:
+        """Bỏ mọi kết quả của content (link đã hỏng / sai nội dung)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE content_hash = ?", (content_hash(content),))
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Xóa bản ghi hết hạn và các bản ghi ít dùng nhất khi vượt max_entries"""
+        self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid IN"
+                " (SELECT rowid FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            logger.info(f"Cache: đã loại {count - self.max_entries} bản ghi ít dùng")
+        self._conn.commit()
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[None]:
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def get_or_post(self, content: str, post_fn: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Trả kết quả trong cache nếu có, nếu không thì đăng và lưu lại.
+        Các dòng trùng nhau chạy song song chỉ đăng một lần (dòng sau chờ dòng trước).
+        """
+        key = content_hash(content)
+        with self._key_lock(key):
+            cached = self.get(content)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return dict(cached, cached=True)
+            with self._lock:
+                self.misses += 1
+            result = post_fn(content)
+            self.put(content, result)
+            return result
+
+
+class JobCache:
+    """
+    Cache dùng chung của process nhưng đếm hit / miss riêng cho một job,
+    job bắt đầu sau không làm lệch số liệu của job đang chạy
+    """
+
+    def __init__(self, cache: ResultCache):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_post(self, content: str, post_fn: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        result = self.cache.get_or_post(content, post_fn)
+        with self._lock:
+            if result.get("cached"):
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result
+
+    def discard(self, content: str) -> None:
+        self.cache.discard(content)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
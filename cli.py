@@ -0,0 +1,356 @@
+"""
+Chạy pipeline đăng bài không cần Streamlit (cron, batch worker...).
+
+    python cli.py post input.xlsx -o results.xlsx --concurrency 8
+    python cli.py post input.csv -o results.xlsx --no-convert --rate dpaste=2 --rate rentry=0.5
+    python cli.py shard input.xlsx -o results.xlsx --workers 4     # nhiều process
+    python cli.py worker --wait                                    # worker ở máy khác, cùng RENTRY_STATE_DIR
+    python cli.py post data/ -o results.xlsx                       # mọi file trong thư mục, mỗi file một sheet
+    python cli.py post input.xlsx --bundle-rows 50                 # 50 dòng ngắn một bài, link kèm #row-N
+    python cli.py post input.xlsx --profile profile.zip            # kèm cProfile / flamegraph / tracemalloc
+
+File kết quả có cùng các sheet với file tải về từ giao diện web và được ghi dần
+trong lúc đăng (.xlsx, .csv hoặc .parquet theo đuôi file / --format).
+Mã thoát: 0 khi mọi dòng thành công, 1 khi có dòng lỗi, 2 khi không đọc được file / sai tham số.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import List
+
+from engine import rate_limiter, DEFAULT_RATE_LIMITS
+from routing import router, DEFAULT_FAILURE_THRESHOLD, DEFAULT_COOLDOWN
+from http_pool import http_pool, DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from deadline import DEFAULT_ROW_BUDGET, configure as configure_row_budget
+from cache import ResultCache, DEFAULT_TTL, DEFAULT_MAX_ENTRIES
+from journal import Journal, file_hash
+from ingest import iter_content_chunks, expand_inputs, check_content_column, MissingContentColumn
+from providers import (configure_endpoints, configure_size_limits, configure_compression,
+                       DEFAULT_SIZE_LIMITS, GZIP_MIN_BYTES)
+from export import EXPORT_FORMATS, export_format
+from shards import (ShardStore, Coordinator, run_worker, record_failed_shards, DEFAULT_SHARD_ROWS,
+                    DONE as SHARD_DONE, LEASED as SHARD_LEASED, FAILED as SHARD_FAILED)
+from pipeline import (InputFile, prepare_rows, iter_batch_results, merge_batch_results, export_results,
+                      unique_names, format_duration)
+from profiling import RunProfiler
+from verify import DEFAULT_VERIFY_CONCURRENCY
+from bundle import DEFAULT_BUNDLE_ROWS, DEFAULT_BUNDLE_BYTES, configure as configure_bundle
+
+logger = logging.getLogger("rentry")
+
+# In tiến độ ra stderr tối đa mỗi chừng này giây
+PROGRESS_INTERVAL = 5.0
+
+
+def parse_rate(value: str):
+    provider, _, rate = value.partition("=")
+    if provider not in DEFAULT_RATE_LIMITS or not rate:
+        raise argparse.ArgumentTypeError(f"--rate phải có dạng provider=số (provider: {', '.join(DEFAULT_RATE_LIMITS)})")
+    return provider, float(rate)
+
+
+def parse_size_limit(value: str):
+    provider, _, limit = value.partition("=")
+    if provider not in DEFAULT_SIZE_LIMITS or not limit.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"--size-limit phải có dạng provider=số (provider: {', '.join(DEFAULT_SIZE_LIMITS)})")
+    return provider, int(limit)
+
+
+def add_output_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("-o", "--output", help="File kết quả (mặc định rentry_results_<timestamp>.xlsx)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="Định dạng file kết quả (mặc định theo đuôi của --output, không có thì xlsx)")
+
+
+def add_pipeline_options(parser: argparse.ArgumentParser) -> None:
+    """Các tùy chọn đăng bài dùng chung cho post / shard / worker"""
+    # Nhận cả sau tên lệnh (worker con được gọi "cli.py worker -v ..."); SUPPRESS để không ghi đè -v đặt trước lệnh
+    parser.add_argument("-v", "--verbose", action="store_true", default=argparse.SUPPRESS,
+                        help="Log chi tiết từng dòng")
+    parser.add_argument("--concurrency", type=int, default=4, help="Số bài đăng song song")
+    parser.add_argument("--no-convert", action="store_true", help="Không chuyển Markdown thành văn bản thuần")
+    parser.add_argument("--rate", type=parse_rate, action="append", default=[],
+                        help="Giới hạn request/giây cho một provider, vd. dpaste=1 (0 = không giới hạn)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT)
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT)
+    parser.add_argument("--row-budget", type=float, default=DEFAULT_ROW_BUDGET,
+                        help="Thời gian tối đa (giây) cho một dòng qua mọi provider, 0 = không giới hạn")
+    parser.add_argument("--failure-threshold", type=int, default=DEFAULT_FAILURE_THRESHOLD)
+    parser.add_argument("--cooldown", type=float, default=DEFAULT_COOLDOWN)
+    parser.add_argument("--no-cache", action="store_true", help="Không dùng lại URL của content đã đăng")
+    parser.add_argument("--cache-ttl-hours", type=float, default=DEFAULT_TTL / 3600)
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    parser.add_argument("--endpoints", help="JSON thay endpoint provider (giống RENTRY_ENDPOINTS)")
+    parser.add_argument("--size-limit", type=parse_size_limit, action="append", default=[],
+                        help="Giới hạn kích thước nội dung của một provider (đơn vị như mặc định), vd. dpaste=100000")
+    parser.add_argument("--gzip-min-bytes", type=int, default=GZIP_MIN_BYTES,
+                        help="Nén gzip khi upload 0x0.st với nội dung từ chừng này byte (0 = tắt)")
+    parser.add_argument("--bundle-rows", type=int, default=DEFAULT_BUNDLE_ROWS, metavar="N",
+                        help="Gộp tối đa N dòng hợp lệ liên tiếp vào một bài, mỗi dòng một heading ## row-<số dòng>"
+                             " và link dạng <url bài gộp>#row-<số dòng> (0 = tắt)")
+    parser.add_argument("--bundle-bytes", type=int, default=DEFAULT_BUNDLE_BYTES,
+                        help="Kích thước tối đa (byte) của một bài gộp")
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="Tải lại từng link (N link song song) để kiểm tra đúng nội dung, link sai được đăng lại."
+                             f" 0 = tắt, hay dùng {DEFAULT_VERIFY_CONCURRENCY}")
+    parser.add_argument("--profile", metavar="ZIP",
+                        help="Profile cả lần chạy (cProfile, collapsed stack mọi thread, đỉnh tracemalloc) vào file zip này")
+
+
+def worker_options(args, workers: int) -> List[str]:
+    """
+    Tham số dòng lệnh cho các process worker con. Giới hạn tốc độ là của từng process
+    nên được chia đều cho số worker để tổng vẫn như khi chạy một process.
+    """
+    rates = {provider: rate for provider, (rate, _) in DEFAULT_RATE_LIMITS.items()}
+    rates.update(dict(args.rate))
+    options = [
+        "--concurrency", str(args.concurrency),
+        "--pool-size", str(args.pool_size),
+        "--connect-timeout", str(args.connect_timeout),
+        "--read-timeout", str(args.read_timeout),
+        "--row-budget", str(args.row_budget),
+        "--failure-threshold", str(args.failure_threshold),
+        "--cooldown", str(args.cooldown),
+        "--cache-ttl-hours", str(args.cache_ttl_hours),
+        "--cache-max-entries", str(args.cache_max_entries),
+        "--gzip-min-bytes", str(args.gzip_min_bytes),
+        "--verify", str(args.verify),
+        "--bundle-rows", str(args.bundle_rows),
+        "--bundle-bytes", str(args.bundle_bytes),
+    ]
+    for provider, rate in rates.items():
+        options += ["--rate", f"{provider}={rate / max(1, workers)}"]
+    for provider, limit in args.size_limit:
+        options += ["--size-limit", f"{provider}={limit}"]
+    if args.endpoints:
+        options += ["--endpoints", args.endpoints]
+    if args.no_cache:
+        options.append("--no-cache")
+    if args.verbose:
+        options.insert(0, "-v")
+    return options
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rentry", description="Rentry/Dpaste bulk poster (không giao diện)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log chi tiết từng dòng")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    post = sub.add_parser("post", help="Đăng toàn bộ cột content của một file")
+    post.add_argument("input", nargs="+",
+                      help="File .xlsx, .csv hoặc .parquet có cột content; thư mục hoặc glob (vd. 'data/*.xlsx')"
+                           " để đăng nhiều file chung một pipeline, mỗi file một sheet kết quả")
+    add_output_options(post)
+    add_pipeline_options(post)
+    post.add_argument("--no-journal", action="store_true", help="Không ghi journal / không resume")
+    post.add_argument("--retry-failed", action="store_true", help="Đăng lại các dòng lỗi trong journal")
+
+    shard = sub.add_parser("shard", help="Chia file thành shard và đăng bằng nhiều process / nhiều máy")
+    shard.add_argument("input", help="File .xlsx, .csv hoặc .parquet có cột content")
+    add_output_options(shard)
+    add_pipeline_options(shard)
+    shard.add_argument("--workers", type=int, default=4,
+                       help="Số process worker chạy trên máy này (0 = chỉ dùng worker ở máy khác)")
+    shard.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS, help="Số dòng mỗi shard")
+    shard.add_argument("--retry-failed", action="store_true", help="Đăng lại các dòng lỗi trong journal")
+
+    worker = sub.add_parser("worker", help="Nhận và đăng các shard trong hàng đợi (cùng RENTRY_STATE_DIR)")
+    add_pipeline_options(worker)
+    worker.add_argument("--batch", help="Chỉ nhận shard của batch này")
+    worker.add_argument("--worker-id", help="Tên worker (mặc định host-pid)")
+    worker.add_argument("--wait", action="store_true", help="Hết việc thì chờ batch mới thay vì thoát")
+    return parser
+
+
+def configure(args) -> None:
+    """Áp cấu hình dòng lệnh lên các thành phần dùng chung"""
+    for provider, (rate, burst) in DEFAULT_RATE_LIMITS.items():
+        rate_limiter.configure(provider, rate, burst)
+    for provider, rate in args.rate:
+        rate_limiter.configure(provider, rate, DEFAULT_RATE_LIMITS[provider][1])
+    http_pool.configure(pool_size=max(args.pool_size, args.concurrency),
+                        connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+    router.configure(failure_threshold=args.failure_threshold, cooldown=args.cooldown)
+    configure_row_budget(args.row_budget)
+    if args.endpoints:
+        configure_endpoints(json.loads(args.endpoints))
+    if args.size_limit:
+        configure_size_limits(dict(args.size_limit))
+    configure_compression(args.gzip_min_bytes)
+    configure_bundle(args.bundle_rows, args.bundle_bytes)
+
+
+def read_rows(path: str, convert: bool, skip: set):
+    """Các dòng chờ đăng của một file, file chỉ được mở khi pipeline tới lượt file đó"""
+    with open(path, "rb") as f:
+        yield from prepare_rows(iter_content_chunks(f, path), convert=convert, skip=skip)
+
+
+def input_files(args, journal) -> List[InputFile]:
+    """
+    Các file đầu vào (file, thư mục hoặc glob) của lệnh post. Nhiều file: file trùng nội dung
+    hoặc thiếu cột content bị bỏ qua kèm cảnh báo, tên file được giữ ở cột file / tên sheet kết quả.
+    """
+    paths = expand_inputs(args.input)
+    multi = len(paths) > 1
+    files: List[InputFile] = []
+    for path, name in zip(paths, unique_names(paths)):
+        with open(path, "rb") as f:
+            fhash = file_hash(f.read())
+        if any(f.fhash == fhash for f in files):
+            print(f"⚠️ Bỏ qua {path}: trùng nội dung với một file khác", file=sys.stderr)
+            continue
+        try:
+            check_content_column(path)
+        except MissingContentColumn as e:
+            if not multi:
+                raise
+            print(f"⚠️ Bỏ qua {path}: không có cột `content` (các cột có sẵn: {e.columns})", file=sys.stderr)
+            continue
+        finished = journal.finished_rows(fhash, include_failed=not args.retry_failed) if journal else set()
+        if finished:
+            logger.info(f"Journal đã có {len(finished)} dòng của {path}, tiếp tục từ các dòng còn lại")
+        files.append(InputFile(name if multi else None, fhash,
+                               read_rows(path, not args.no_convert, finished), finished))
+    if not files:
+        raise ValueError("Không còn file đầu vào nào có cột `content`")
+    return files
+
+
+def command_post(args) -> int:
+    configure(args)
+    output = args.output or f"rentry_results_{int(time.time())}.{args.format or 'xlsx'}"
+    export_format(output, args.format)  # báo lỗi định dạng trước khi bắt đầu đăng
+
+    journal = None if args.no_journal else Journal()
+    files = input_files(args, journal)
+    names = [f.name for f in files if f.name is not None]
+    cache = open_cache(args)
+
+    started = last_report = time.monotonic()
+    processed = 0
+
+    # Mọi file chung một engine: chung concurrency / rate limit, file sau bắt đầu khi file trước sắp xong
+    items = ((idx, content, valid, f.name, f.fhash) for f in files for idx, content, valid in f.rows)
+
+    def posted():
+        nonlocal processed, last_report
+        for item, result in iter_batch_results(items, args.concurrency, journal=journal, cache=cache,
+                                               verify_concurrency=args.verify):
+            processed += 1
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                rate = processed / (now - started)
+                print(f"... {processed} dòng, {rate:.2f} dòng/s, đã chạy {format_duration(now - started)}",
+                      file=sys.stderr)
+            yield item, result
+
+    # Kết quả được ghi dần ra file (kèm các dòng đã có trong journal) ngay khi từng dòng xong
+    writer = export_results(merge_batch_results(files, posted(), journal), output, args.format,
+                            files=names or None)
+    if names:
+        print(writer.file_summary().to_string(index=False))
+    return report(writer.summary(), cache, output)
+
+
+def command_shard(args) -> int:
+    configure(args)
+    output = args.output or f"rentry_results_{int(time.time())}.{args.format or 'xlsx'}"
+    export_format(output, args.format)
+
+    with open(args.input, "rb") as f:
+        fhash = file_hash(f.read())
+    journal = Journal()
+    finished = journal.finished_rows(fhash, include_failed=not args.retry_failed)
+
+    # Kiểm tra + chuyển đổi một lần ở đây, worker chỉ đọc nội dung đã sẵn trong hàng đợi
+    store = ShardStore()
+    with open(args.input, "rb") as f:
+        rows = prepare_rows(iter_content_chunks(f, args.input), convert=not args.no_convert, skip=finished)
+        batch_id = store.create_batch(fhash, os.path.basename(args.input), rows, args.shard_rows)
+    print(f"🧩 Batch {batch_id}: {sum(store.progress(batch_id).values())} shard. Máy khác có thể cùng chạy:"
+          f" python cli.py worker --batch {batch_id}", file=sys.stderr)
+
+    started = last_report = time.monotonic()
+
+    def on_progress(progress):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            print(f"... shard xong {progress[SHARD_DONE]}/{sum(progress.values())}, đang chạy {progress[SHARD_LEASED]},"
+                  f" đã chạy {format_duration(now - started)}", file=sys.stderr)
+
+    progress = Coordinator(store, batch_id, args.workers, worker_options(args, args.workers)).run(on_progress)
+    if progress[SHARD_FAILED]:
+        abandoned = record_failed_shards(store, journal, batch_id, fhash)
+        print(f"⚠️ {progress[SHARD_FAILED]} shard bị bỏ vì worker chết liên tục,"
+              f" {abandoned} dòng được ghi là lỗi", file=sys.stderr)
+    store.drop(batch_id)
+
+    # Gộp kết quả mọi shard (và các dòng đã có từ trước) theo thứ tự dòng
+    writer = export_results(journal.iter_results(fhash), output, args.format)
+    code = report(writer.summary(), None, output)
+    return 1 if progress[SHARD_FAILED] else code
+
+
+def command_worker(args) -> int:
+    configure(args)
+    completed = run_worker(ShardStore(), Journal(), open_cache(args), args.concurrency,
+                           batch_id=args.batch, worker=args.worker_id, wait=args.wait,
+                           verify_concurrency=args.verify)
+    logger.info(f"Worker xong {completed} shard")
+    return 0
+
+
+def open_cache(args):
+    if args.no_cache:
+        return None
+    return ResultCache(ttl=args.cache_ttl_hours * 3600, max_entries=args.cache_max_entries)
+
+
+def report(summary, cache, output: str) -> int:
+    print(f"✅ Thành công: {summary['success']}  ❌ Lỗi: {summary['error']}  📊 Tổng: {summary['total']}")
+    if summary.get("verified") or summary.get("unverified"):
+        print(f"🔎 Link đúng nội dung: {summary['verified']}  ⚠️ Chưa xác minh: {summary['unverified']}")
+    if cache is not None:
+        print(f"♻️ Cache hit: {cache.hits}  📤 Cache miss: {cache.misses}")
+    print(f"📥 Kết quả: {os.path.abspath(output)}")
+    return 0 if summary["error"] == 0 else 1
+
+
+COMMANDS = {
+    "post": command_post,
+    "shard": command_shard,
+    "worker": command_worker,
+}
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        if not args.profile:
+            return COMMANDS[args.command](args)
+        with RunProfiler() as profiler:
+            code = COMMANDS[args.command](args)
+        print(f"🔬 Profile: {os.path.abspath(profiler.save(args.profile))}", file=sys.stderr)
+        return code
+    except MissingContentColumn as e:
+        print(f"❌ File phải có cột tên là `content`. Các cột có sẵn: {e.columns}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
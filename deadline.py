@@ -0,0 +1,111 @@
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import telemetry
+
+# Thời gian tối đa cho một dòng (mọi provider, retry, chờ rate limit cộng lại), 0 = không giới hạn
+DEFAULT_ROW_BUDGET = float(os.environ.get("RENTRY_ROW_BUDGET", "120"))
+ROW_BUDGET = DEFAULT_ROW_BUDGET
+
+# Backoff giữa các lần thử: base * 2^attempt, tối đa BACKOFF_CAP giây, nửa sau là jitter
+BACKOFF_CAP = 8.0
+
+_local = threading.local()
+
+
+class BudgetExceeded(Exception):
+    """Dòng đã dùng hết thời gian cho phép"""
+
+
+def configure(row_budget: float) -> None:
+    global ROW_BUDGET
+    ROW_BUDGET = max(0.0, float(row_budget))
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget = float(seconds)
+        self.expires = time.monotonic() + self.budget
+        # Số lần một bước bị dừng vì hết thời gian của dòng (không phải lỗi của provider)
+        self.misses = 0
+
+    def remaining(self) -> float:
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def current() -> Optional[Deadline]:
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def row_deadline(seconds: Optional[float] = None) -> Iterator[Optional[Deadline]]:
+    """Đặt hạn chót cho dòng đang xử lý trên thread hiện tại (0 = không giới hạn)"""
+    seconds = ROW_BUDGET if seconds is None else seconds
+    previous = current()
+    _local.deadline = Deadline(seconds) if seconds > 0 else None
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def remaining() -> Optional[float]:
+    """Số giây còn lại của dòng hiện tại, None nếu không giới hạn"""
+    deadline = current()
+    return None if deadline is None else deadline.remaining()
+
+
+def expired() -> bool:
+    deadline = current()
+    return deadline is not None and deadline.expired
+
+
+def exceeded(message: str) -> BudgetExceeded:
+    """BudgetExceeded cho dòng hiện tại, được đếm để router không tính là lỗi của provider"""
+    deadline = current()
+    if deadline is not None:
+        deadline.misses += 1
+    return BudgetExceeded(message)
+
+
+def misses() -> int:
+    deadline = current()
+    return 0 if deadline is None else deadline.misses
+
+
+def check() -> None:
+    if expired():
+        raise exceeded(f"Hết thời gian cho dòng ({current().budget:.0f}s)")
+
+
+def clip(seconds: float) -> float:
+    """Rút `seconds` về phần thời gian còn lại; hết thời gian thì raise BudgetExceeded"""
+    left = remaining()
+    if left is None:
+        return seconds
+    check()
+    return min(seconds, left)
+
+
+def clip_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """Timeout (connect, read) của một request, không vượt quá thời gian còn lại của dòng"""
+    connect, read = timeout
+    return (clip(connect), clip(read))
+
+
+def backoff(attempt: int, base: float = 1.0, provider: Optional[str] = None) -> None:
+    """
+    Ngủ trước lần thử thứ attempt + 1: base * 2^attempt (tối đa BACKOFF_CAP) với jitter,
+    không ngủ quá thời gian còn lại của dòng
+    """
+    delay = min(BACKOFF_CAP, base * (2 ** attempt))
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    telemetry.traced_sleep(clip(delay), provider)
@@ -0,0 +1,168 @@
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Iterable, Iterator, Callable, Tuple
+
+import telemetry
+import deadline
+
+logger = logging.getLogger(__name__)
+
+# Giới hạn mặc định cho từng provider: (số request/giây, burst)
+DEFAULT_RATE_LIMITS = {
+    "dpaste": (1.0, 2),
+    "rentry": (0.5, 2),
+    "0x0.st": (0.5, 1),
+    "pastebin": (0.2, 1),
+}
+
+# Không chờ Retry-After quá lâu cho một provider
+MAX_RETRY_AFTER = 300.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Đọc header Retry-After (số giây hoặc HTTP-date) thành số giây cần chờ
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Token bucket thread-safe: `rate` token/giây, tối đa `capacity` token"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self._lock = threading.Lock()
+        self.configure(rate, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def configure(self, rate: float, capacity: float = 1) -> None:
+        with self._lock:
+            self.rate = max(float(rate), 0.0)
+            self.capacity = max(float(capacity), 1.0)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: Optional[float] = None) -> float:
+        """
+        Chờ đến khi có token, trả về thời gian đã chờ (giây).
+        Nếu phải chờ quá `max_wait` giây thì raise BudgetExceeded ngay, không chờ vô ích.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # Retry-After áp dụng cả khi rate = 0 (không giới hạn tốc độ nhưng server vẫn bảo chờ)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.rate <= 0:
+                    return waited  # rate = 0 nghĩa là không giới hạn
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    wait = (1 - self._tokens) / self.rate
+            if max_wait is not None and waited + wait > max_wait:
+                raise deadline.exceeded(f"Phải chờ rate limit {wait:.1f}s, vượt thời gian còn lại của dòng")
+            time.sleep(wait)
+            waited += wait
+
+    def defer(self, seconds: float) -> None:
+        """Chặn bucket trong `seconds` giây (dùng cho Retry-After)"""
+        with self._lock:
+            until = time.monotonic() + min(seconds, MAX_RETRY_AFTER)
+            self._blocked_until = max(self._blocked_until, until)
+
+
+class RateLimiter:
+    """Tập các token bucket, mỗi provider một bucket"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        for provider, (rate, burst) in (limits or DEFAULT_RATE_LIMITS).items():
+            self._buckets[provider] = TokenBucket(rate, burst)
+
+    def bucket(self, provider: str) -> TokenBucket:
+        with self._lock:
+            if provider not in self._buckets:
+                self._buckets[provider] = TokenBucket(0)
+            return self._buckets[provider]
+
+    def configure(self, provider: str, rate: float, burst: float = 1) -> None:
+        self.bucket(provider).configure(rate, burst)
+
+    def acquire(self, provider: str) -> float:
+        waited = self.bucket(provider).acquire(deadline.remaining())
+        telemetry.record_rate_wait(provider, waited)
+        return waited
+
+    def honor_retry_after(self, provider: str, response: Any) -> Optional[float]:
+        """
+        Nếu response là 429/503 có Retry-After thì tạm dừng provider tương ứng
+        """
+        if response is None or response.status_code not in (429, 503):
+            return None
+        seconds = parse_retry_after(response.headers.get("Retry-After"))
+        if seconds is None:
+            return None
+        logger.warning(f"{provider}: Retry-After {seconds:.1f}s (status {response.status_code})")
+        self.bucket(provider).defer(seconds)
+        return seconds
+
+
+# Dùng chung cho cả process để mọi batch tôn trọng cùng một giới hạn
+rate_limiter = RateLimiter()
+
+
+class PostingEngine:
+    """
+    Chạy `post_fn` song song trên nhiều luồng, trả kết quả theo đúng thứ tự đầu vào
+    """
+
+    def __init__(self, post_fn: Callable[[Any], Any], concurrency: int = 4):
+        self.post_fn = post_fn
+        self.concurrency = max(1, int(concurrency))
+        # Cho phép xếp hàng trước một ít để luồng không phải chờ dòng chậm ở đầu
+        self.max_in_flight = self.concurrency * 4
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+        """
+        Đăng lần lượt các item, yield (item, kết quả) theo thứ tự đầu vào.
+        `items` có thể là generator, chỉ được đọc dần khi còn chỗ trống.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="poster") as pool:
+            try:
+                for item in items:
+                    pending.append((item, pool.submit(self.post_fn, item)))
+                    while len(pending) >= self.max_in_flight:
+                        head, future = pending.popleft()
+                        yield head, future.result()
+                while pending:
+                    head, future = pending.popleft()
+                    yield head, future.result()
+            finally:
+                # Generator bị đóng giữa chừng (rerun, lỗi): bỏ các việc chưa chạy
+                for _, future in pending:
+                    future.cancel()
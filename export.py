@@ -0,0 +1,297 @@
+import os
+import re
+import csv
+import logging
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from journal import state_subdir
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ["xlsx", "csv", "parquet"]
+EXPORT_MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Cột cố định của sheet Results (cột ms_<provider> được thêm theo chuỗi provider)
+RESULT_COLUMNS = [
+    "row", "status", "url", "edit_code", "method", "cached", "tried", "error",
+    "total_ms", "attempts", "connect_ms", "server_wait_ms", "sleep_ms", "rate_wait_ms",
+    "verified", "verify_ms", "verify_error", "reposts", "bundle_url", "anchor",
+]
+ATTEMPT_COLUMNS = [
+    "row", "kind", "provider", "at_ms", "duration_ms", "ok",
+    "method", "status", "connect_ms", "server_wait_ms", "error",
+]
+PROVIDER_COLUMNS = ["provider", "attempts", "success", "avg_ms", "p95_ms", "total_ms"]
+# Sheet Summary của batch nhiều file: mỗi file một dòng + dòng tổng
+FILE_SUMMARY_COLUMNS = ["file", "total", "success", "error", "verified", "unverified"]
+SUMMARY_TOTAL = "Tổng"
+
+# Số dòng gom lại trước khi ghi một row group Parquet
+PARQUET_BATCH_ROWS = 1000
+# File kết quả trong thư mục exports được giữ chừng này giây
+EXPORT_TTL = 24 * 3600
+
+
+class ProviderStats:
+    """Tổng hợp thời gian theo provider khi ghi dần (chỉ giữ thời lượng từng lần thử)"""
+
+    def __init__(self):
+        self._durations: Dict[str, array] = {}
+        self._success: Dict[str, int] = {}
+
+    def add(self, span: Dict[str, Any]) -> None:
+        provider = span.get("provider")
+        self._durations.setdefault(provider, array("d")).append(float(span.get("duration_ms") or 0.0))
+        self._success[provider] = self._success.get(provider, 0) + (1 if span.get("ok") else 0)
+
+    def table(self) -> pd.DataFrame:
+        rows = []
+        for provider in sorted(self._durations, key=str):
+            durations = pd.Series(self._durations[provider])
+            rows.append({
+                "provider": provider,
+                "attempts": len(durations),
+                "success": self._success[provider],
+                "avg_ms": durations.mean(),
+                "p95_ms": durations.quantile(0.95),
+                "total_ms": durations.sum(),
+            })
+        return pd.DataFrame(rows, columns=PROVIDER_COLUMNS).round(1)
+
+
+class ResultWriter(ABC):
+    """
+    Ghi kết quả từng dòng ra file ngay khi có, bộ nhớ không tăng theo số dòng.
+    File được ghi vào `<path>.part` và chỉ đổi tên thành `path` khi close() thành công.
+    `files`: tên các file của batch nhiều file, kết quả khi đó có thêm cột file.
+    """
+
+    def __init__(self, path: str, providers: Iterable[str] = (), files: Optional[List[str]] = None):
+        self.path = path
+        self.files = list(files) if files else None
+        self.columns = (["file"] if self.files else []) + RESULT_COLUMNS + [f"ms_{name}" for name in providers]
+        self.providers = ProviderStats()
+        self._counts: Dict[Optional[str], Dict[str, int]] = {
+            name: dict.fromkeys(FILE_SUMMARY_COLUMNS[1:], 0) for name in (self.files or [None])
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._part = f"{path}.part"
+
+    @property
+    def total(self) -> int:
+        return sum(counts["total"] for counts in self._counts.values())
+
+    def summary(self) -> Dict[str, int]:
+        """Số liệu cộng dồn mọi file: success / error / total / verified / unverified"""
+        return {key: sum(counts[key] for counts in self._counts.values()) for key in FILE_SUMMARY_COLUMNS[1:]}
+
+    def file_summary(self) -> pd.DataFrame:
+        """Mỗi file một dòng số liệu, dòng cuối là tổng"""
+        rows = [dict(counts, file=name) for name, counts in self._counts.items()]
+        rows.append(dict(self.summary(), file=SUMMARY_TOTAL))
+        return pd.DataFrame(rows, columns=FILE_SUMMARY_COLUMNS)
+
+    def write(self, result: Dict[str, Any]) -> None:
+        counts = self._counts[result.get("file") if self.files else None]
+        counts["total"] += 1
+        counts["success" if result.get("url") else "error"] += 1
+        if result.get("verified") is not None:
+            counts["verified" if result["verified"] else "unverified"] += 1
+        spans = result.get("spans") or []
+        for span in spans:
+            if span.get("kind") == "attempt":
+                self.providers.add(span)
+        self._write(result, spans)
+
+    @abstractmethod
+    def _write(self, result: Dict[str, Any], spans: List[Dict[str, Any]]) -> None:
+        """Ghi một dòng kết quả (và các lần thử của dòng đó)"""
+
+    @abstractmethod
+    def _finish(self) -> None:
+        """Ghi phần còn lại và đóng file `.part`"""
+
+    def close(self) -> None:
+        self._finish()
+        os.replace(self._part, self.path)
+        logger.info(f"Đã ghi {self.total} dòng kết quả vào {self.path}")
+
+    def abort(self) -> None:
+        try:
+            self._finish()
+        except Exception:
+            pass
+        if os.path.exists(self._part):
+            os.remove(self._part)
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class XlsxResultWriter(ResultWriter):
+    """
+    openpyxl write-only: các sheet Results / Attempts được ghi dần, Providers ghi khi đóng.
+    Batch nhiều file: sheet Summary đứng đầu, mỗi file một sheet kết quả thay cho Results.
+    """
+
+    def __init__(self, path: str, providers: Iterable[str] = (), files: Optional[List[str]] = None):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+        super().__init__(path, providers, files)
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self._workbook = Workbook(write_only=True)
+        self._summary = self._workbook.create_sheet("Summary") if self.files else None
+        # Sheet của từng file không cần cột file
+        self._sheet_columns = [c for c in self.columns if c != "file"]
+        if self.files:
+            used = {"summary", "attempts", "providers"}
+            self._sheets = {name: self._workbook.create_sheet(sheet_title(name, used)) for name in self.files}
+        else:
+            self._sheets = {None: self._workbook.create_sheet("Results")}
+        self._attempt_columns = (["file"] if self.files else []) + ATTEMPT_COLUMNS
+        self._attempts = self._workbook.create_sheet("Attempts")
+        self._providers = self._workbook.create_sheet("Providers")
+        for sheet in self._sheets.values():
+            sheet.append(self._sheet_columns)
+        self._attempts.append(self._attempt_columns)
+
+    def _cell(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self._illegal.sub("", value)
+        if value is None or isinstance(value, (int, float)):
+            return value
+        return str(value)
+
+    def _write(self, result: Dict[str, Any], spans: List[Dict[str, Any]]) -> None:
+        sheet = self._sheets[result.get("file") if self.files else None]
+        sheet.append([self._cell(result.get(c)) for c in self._sheet_columns])
+        for span in spans:
+            span = dict(span, row=result.get("row"), file=result.get("file"))
+            self._attempts.append([self._cell(span.get(c)) for c in self._attempt_columns])
+
+    def _finish(self) -> None:
+        if self._summary is not None:
+            self._summary.append(FILE_SUMMARY_COLUMNS)
+            for row in self.file_summary().itertuples(index=False):
+                self._summary.append([self._cell(v.item() if hasattr(v, "item") else v) for v in row])
+        table = self.providers.table()
+        self._providers.append(PROVIDER_COLUMNS)
+        for row in table.itertuples(index=False):
+            self._providers.append([self._cell(v.item() if hasattr(v, "item") else v) for v in row])
+        self._workbook.save(self._part)
+
+
+class CsvResultWriter(ResultWriter):
+    """Chỉ ghi sheet Results (batch nhiều file: mọi file chung một bảng, phân biệt bằng cột file)"""
+
+    def __init__(self, path: str, providers: Iterable[str] = (), files: Optional[List[str]] = None):
+        super().__init__(path, providers, files)
+        # utf-8-sig để Excel đọc đúng tiếng Việt
+        self._file = open(self._part, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def _write(self, result: Dict[str, Any], spans: List[Dict[str, Any]]) -> None:
+        self._writer.writerow(result)
+
+    def _finish(self) -> None:
+        self._file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    """Như CsvResultWriter, mỗi PARQUET_BATCH_ROWS dòng một row group"""
+
+    def __init__(self, path: str, providers: Iterable[str] = (), files: Optional[List[str]] = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Ghi Parquet cần cài đặt pyarrow (pip install pyarrow)")
+
+        super().__init__(path, providers, files)
+        self._pa = pa
+        types = {"row": pa.int64(), "attempts": pa.int64(), "reposts": pa.int64(),
+                 "cached": pa.bool_(), "verified": pa.bool_()}
+        self._schema = pa.schema([
+            (c, types.get(c, pa.float64() if c.endswith("_ms") else pa.string()))
+            for c in self.columns
+        ])
+        self._strings = [c for c in self.columns if self._schema.field(c).type == pa.string()]
+        self._writer = pq.ParquetWriter(self._part, self._schema)
+        self._buffer: List[Dict[str, Any]] = []
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self._schema))
+            self._buffer = []
+
+    def _write(self, result: Dict[str, Any], spans: List[Dict[str, Any]]) -> None:
+        row = {c: result.get(c) for c in self.columns}
+        for c in self._strings:
+            if row[c] is not None and not isinstance(row[c], str):
+                row[c] = str(row[c])
+        self._buffer.append(row)
+        if len(self._buffer) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _finish(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+_WRITERS = {
+    "xlsx": XlsxResultWriter,
+    "csv": CsvResultWriter,
+    "parquet": ParquetResultWriter,
+}
+
+
+def export_format(path: str, fmt: Optional[str] = None) -> str:
+    """Định dạng xuất: theo `fmt` nếu có, không thì theo đuôi file (mặc định xlsx)"""
+    fmt = (fmt or os.path.splitext(str(path))[1].lstrip(".") or "xlsx").lower()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Định dạng kết quả không hỗ trợ: {fmt} (chỉ nhận {', '.join(EXPORT_FORMATS)})")
+    return fmt
+
+
+def open_writer(path: str, fmt: Optional[str] = None, providers: Iterable[str] = (),
+                files: Optional[List[str]] = None) -> ResultWriter:
+    return _WRITERS[export_format(path, fmt)](path, providers, files)
+
+
+def sheet_title(name: str, used: set) -> str:
+    """Tên sheet Excel cho một file: bỏ đuôi và ký tự cấm, tối đa 31 ký tự, không trùng `used`"""
+    base = re.sub(r"[\[\]:*?/\\]", "_", os.path.splitext(os.path.basename(name))[0]).strip("' ") or "Sheet"
+    title = base[:31]
+    n = 2
+    while title.lower() in used:
+        suffix = f"~{n}"
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def export_path(name: str, fmt: str) -> str:
+    """Đường dẫn file kết quả trong thư mục exports, xóa luôn các file quá EXPORT_TTL"""
+    return os.path.join(state_subdir("exports", EXPORT_TTL), f"{name}.{fmt}")
+
+
+def read_export(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
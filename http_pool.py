@@ -0,0 +1,184 @@
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import telemetry
+import deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+
+class PoolStats:
+    """Bộ đếm request / kết nối mới cho một host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def add_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": max(0, self.requests - self.new_connections),
+            }
+
+
+def _counting_pool(base, stats: PoolStats):
+    """Tạo lớp connection pool đếm (và đo thời gian) mỗi lần phải mở kết nối TCP/TLS mới"""
+
+    class TimedConnection(base.ConnectionCls):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                telemetry.record_connect(time.perf_counter() - started)
+
+    class CountingPool(base):
+        ConnectionCls = TimedConnection
+
+        def _new_conn(self):
+            stats.add_connection()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter ghi nhận số request và số kết nối mới vào PoolStats"""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.stats),
+            "https": _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.add_request()
+        return super().send(request, **kwargs)
+
+
+class HttpPool:
+    """
+    Một requests.Session keep-alive cho mỗi host, dùng chung cho cả batch
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self.pool_size = int(pool_size)
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+        self._local = threading.local()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        override = getattr(self._local, "timeout", None)
+        return override or (self.connect_timeout, self.read_timeout)
+
+    @contextmanager
+    def request_timeout(self, connect: float, read: float) -> Iterator[None]:
+        """Timeout mặc định cho các request trên thread hiện tại (cấu hình của job đang đăng dòng này)"""
+        previous = getattr(self._local, "timeout", None)
+        self._local.timeout = (float(connect), float(read))
+        try:
+            yield
+        finally:
+            self._local.timeout = previous
+
+    def configure(self, pool_size: Optional[int] = None,
+                  connect_timeout: Optional[float] = None,
+                  read_timeout: Optional[float] = None) -> None:
+        """Đổi cấu hình; đổi pool_size sẽ đóng các session cũ"""
+        if connect_timeout is not None:
+            self.connect_timeout = float(connect_timeout)
+        if read_timeout is not None:
+            self.read_timeout = float(read_timeout)
+        if pool_size is not None and int(pool_size) != self.pool_size:
+            self.pool_size = int(pool_size)
+            self.close()
+
+    def session(self, url: str, name: Optional[str] = None) -> requests.Session:
+        """
+        Lấy session cho host của `url`. `name` cho phép tách riêng một session
+        có cookie (ví dụ rentry session mode) khỏi session dùng chung của host.
+        """
+        key = name or urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                stats = self._stats.setdefault(key, PoolStats())
+                adapter = CountingAdapter(stats, pool_connections=1, pool_maxsize=self.pool_size)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+                logger.info(f"Tạo connection pool cho {key} (size {self.pool_size})")
+            return session
+
+    def request(self, method: str, url: str, name: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        # Timeout không vượt quá thời gian còn lại của dòng đang đăng (xem deadline.row_deadline)
+        timeout = tuple(kwargs.get("timeout") or self.timeout)
+        kwargs["timeout"] = deadline.clip_timeout(timeout)
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        try:
+            r = self.session(url, name).request(method, url, **kwargs)
+        except Exception as e:
+            telemetry.record_request(host, method, time.perf_counter() - started, error=str(e))
+            if isinstance(e, requests.Timeout) and kwargs["timeout"] != timeout:
+                # Timeout đã bị rút ngắn theo thời gian còn lại: dòng hết giờ, không phải host chậm
+                raise deadline.exceeded(f"Hết thời gian cho dòng khi chờ {host}") from e
+            raise
+        telemetry.record_request(host, method, time.perf_counter() - started, r.status_code, r.elapsed.total_seconds())
+        return r
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {key: stats.snapshot() for key, stats in self._stats.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+# Dùng chung cho cả process: các batch liên tiếp tái sử dụng kết nối keep-alive
+http_pool = HttpPool()
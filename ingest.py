@@ -0,0 +1,142 @@
+import os
+import glob
+import logging
+from typing import Any, BinaryIO, Iterator, List, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_TYPES = ["xlsx", "csv", "parquet"]
+CONTENT_COLUMN = "content"
+CHUNK_ROWS = 5000
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+
+class MissingContentColumn(ValueError):
+    """File không có cột `content`"""
+
+    def __init__(self, columns: List[Any]):
+        self.columns = list(columns)
+        super().__init__(f"Không có cột `{CONTENT_COLUMN}`, các cột có sẵn: {self.columns}")
+
+
+def file_type(name: str) -> str:
+    ext = os.path.splitext(str(name))[1].lower().lstrip(".")
+    if ext not in SUPPORTED_TYPES:
+        raise ValueError(f"Định dạng không hỗ trợ: .{ext} (chỉ nhận {', '.join(SUPPORTED_TYPES)})")
+    return ext
+
+
+def _iter_xlsx(source: Source, chunk_rows: int) -> Iterator[pd.Series]:
+    """Đọc sheet đầu tiên bằng openpyxl read-only, chỉ giữ cột content"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        if CONTENT_COLUMN not in header:
+            raise MissingContentColumn([h for h in header if h is not None])
+        col = header.index(CONTENT_COLUMN)
+
+        chunk = []
+        blank_rows = 0  # dòng trống ở cuối sheet bị bỏ qua giống pd.read_excel
+        for row in rows:
+            if not any(cell is not None for cell in row):
+                blank_rows += 1
+                continue
+            if blank_rows:
+                chunk.extend([None] * blank_rows)
+                blank_rows = 0
+            chunk.append(row[col] if col < len(row) else None)
+            if len(chunk) >= chunk_rows:
+                yield pd.Series(chunk, dtype=object, name=CONTENT_COLUMN)
+                chunk = []
+        if chunk:
+            yield pd.Series(chunk, dtype=object, name=CONTENT_COLUMN)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(source: Source, chunk_rows: int) -> Iterator[pd.Series]:
+    if hasattr(source, "seek"):
+        start = source.tell()
+        header = pd.read_csv(source, nrows=0).columns
+        source.seek(start)
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+    if CONTENT_COLUMN not in header:
+        raise MissingContentColumn(header)
+    reader = pd.read_csv(source, usecols=[CONTENT_COLUMN], dtype={CONTENT_COLUMN: object}, chunksize=chunk_rows)
+    for frame in reader:
+        yield frame[CONTENT_COLUMN].astype(object)
+
+
+def _iter_parquet(source: Source, chunk_rows: int) -> Iterator[pd.Series]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Đọc Parquet cần cài đặt pyarrow (pip install pyarrow)")
+
+    parquet = pq.ParquetFile(source)
+    if CONTENT_COLUMN not in parquet.schema_arrow.names:
+        raise MissingContentColumn(parquet.schema_arrow.names)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=[CONTENT_COLUMN]):
+        yield pd.Series(batch.column(0).to_pylist(), dtype=object, name=CONTENT_COLUMN)
+
+
+_READERS = {
+    "xlsx": _iter_xlsx,
+    "csv": _iter_csv,
+    "parquet": _iter_parquet,
+}
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """
+    Đường dẫn file, thư mục (mọi file .xlsx / .csv / .parquet ngay bên trong) hoặc glob (hỗ trợ **)
+    thành danh sách file theo thứ tự, không trùng. File tạm ~$... của Excel bị bỏ qua.
+    """
+    paths: List[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+        elif any(c in pattern for c in "*?["):
+            found = sorted(glob.glob(pattern, recursive=True))
+        else:
+            if pattern not in paths:
+                paths.append(pattern)
+            continue
+        for path in found:
+            name = os.path.basename(path)
+            supported = os.path.splitext(name)[1].lower().lstrip(".") in SUPPORTED_TYPES
+            if os.path.isfile(path) and supported and not name.startswith("~$") and path not in paths:
+                paths.append(path)
+    if not paths:
+        raise ValueError(f"Không tìm thấy file đầu vào nào: {' '.join(patterns)}")
+    return paths
+
+
+def check_content_column(path: str) -> None:
+    """Chỉ đọc phần đầu file để báo sớm MissingContentColumn / định dạng không hỗ trợ"""
+    with open(path, "rb") as f:
+        next(iter_content_chunks(f, path, chunk_rows=1), None)
+
+
+def iter_content_chunks(source: Source, name: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.Series]:
+    """
+    Đọc dần cột content theo từng khối `chunk_rows` dòng, không nạp cả file vào bộ nhớ
+    """
+    kind = file_type(name)
+    logger.info(f"Đọc {name} ({kind}) theo khối {chunk_rows} dòng")
+    yield from _READERS[kind](source, chunk_rows)
+
+
+def load_content_frame(source: Source, name: str, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Đọc toàn bộ cột content thành DataFrame một cột"""
+    chunks = list(iter_content_chunks(source, name, chunk_rows))
+    if not chunks:
+        return pd.DataFrame({CONTENT_COLUMN: pd.Series([], dtype=object)})
+    return pd.DataFrame({CONTENT_COLUMN: pd.concat(chunks, ignore_index=True)})
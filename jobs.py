@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+DEFAULT_MAX_JOBS = int(os.environ.get("RENTRY_MAX_JOBS", "2"))
+# Số job đã xong được giữ lại để UI còn xem / tải kết quả
+KEEP_FINISHED_JOBS = 50
+# Số dòng kết quả gần nhất / dòng lỗi gần nhất giữ trong job để UI hiển thị trực tiếp
+RECENT_ROWS = 200
+RECENT_FAILURES = 50
+
+
+class Job:
+    """Một batch đăng bài chạy nền, UI đọc tiến độ bằng cách poll"""
+
+    def __init__(self, name: str, total: int, meta: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.total = int(total)
+        self.meta = dict(meta or {})
+        self.status = QUEUED
+        self.done = 0
+        self.success = 0
+        self.errors = 0
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._recent: deque = deque(maxlen=RECENT_ROWS)
+        self._failures: deque = deque(maxlen=RECENT_FAILURES)
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def progress(self) -> float:
+        return min(1.0, self.done / self.total) if self.total else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def advance(self, ok: bool, count: int = 1, result: Optional[Dict[str, Any]] = None) -> None:
+        """Cập nhật tiến độ sau khi xong `count` dòng, `result` được giữ lại cho bảng trực tiếp"""
+        with self._lock:
+            self.done += count
+            if ok:
+                self.success += count
+            else:
+                self.errors += count
+            if result is not None:
+                self._recent.append(result)
+                if not ok:
+                    self._failures.append(result)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Các dòng xong gần nhất (tối đa RECENT_ROWS), mới nhất ở cuối"""
+        with self._lock:
+            return list(self._recent)
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """Các dòng lỗi gần nhất (tối đa RECENT_FAILURES), mới nhất ở cuối"""
+        with self._lock:
+            return list(self._failures)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "success": self.success,
+                "errors": self.errors,
+                "elapsed_s": round(self.elapsed, 1),
+                "error": self.error,
+            }
+
+
+class JobManager:
+    """
+    Hàng đợi job dùng chung cho cả process: tối đa `max_workers` batch chạy cùng lúc,
+    các batch còn lại chờ ở trạng thái queued.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_JOBS):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, total: int, fn: Callable[..., Any],
+               meta: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Job:
+        """
+        Đưa `fn(job, **kwargs)` vào hàng đợi. `fn` cập nhật tiến độ qua job.advance()
+        và nên dừng sớm khi job.cancelled; giá trị trả về được lưu ở job.result.
+        """
+        job = Job(name, total, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn, kwargs)
+        logger.info(f"Job {job.id} ({name}): đã xếp hàng {total} dòng")
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], kwargs: Dict[str, Any]) -> None:
+        if job.cancelled:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, **kwargs)
+            job.status = CANCELLED if job.cancelled else DONE
+        except Exception as e:
+            logger.exception(f"Job {job.id} lỗi")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            logger.info(f"Job {job.id}: {job.status} ({job.done}/{job.total})")
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def busy(self) -> bool:
+        """Còn job đang chạy hoặc đang chờ"""
+        with self._lock:
+            return any(not job.finished for job in self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+
+
+# Dùng chung cho mọi phiên Streamlit trong process
+job_manager = JobManager()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Collection, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Thư mục lưu trạng thái (journal, cache...) giữa các lần chạy
+STATE_DIR = os.environ.get("RENTRY_STATE_DIR", ".rentry_state")
+
+
+def state_subdir(name: str, ttl: Optional[float] = None) -> str:
+    """Thư mục con `name` trong STATE_DIR; nếu có `ttl` thì xóa các file cũ hơn ttl giây"""
+    directory = os.path.join(STATE_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    if ttl is not None:
+        cutoff = time.time() - ttl
+        for entry in os.scandir(directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+    return directory
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Mở database trạng thái ở chế độ rollback journal: STATE_DIR có thể nằm trên ổ mạng
+    dùng chung giữa các máy (worker shard), nơi SQLite không hỗ trợ WAL (cần shared memory cùng máy)
+    """
+    conn = sqlite3.connect(path, timeout=30.0, **kwargs)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    return conn
+
+
+def file_hash(data: bytes) -> str:
+    """Hash nội dung file upload, dùng làm khóa để resume"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class Journal:
+    """
+    Journal append-only trên SQLite: mỗi dòng đăng xong được ghi ngay,
+    khóa theo (hash file, chỉ số dòng). Bản ghi mới nhất của một dòng là kết quả của dòng đó.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(STATE_DIR, "journal.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " file_hash TEXT NOT NULL,"
+            " row_idx INTEGER NOT NULL,"
+            " ok INTEGER NOT NULL,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_file ON entries (file_hash, row_idx)")
+        self._conn.commit()
+
+    def record(self, fhash: str, row_idx: int, result: Dict[str, Any]) -> None:
+        """Ghi kết quả một dòng (commit ngay để không mất khi crash)"""
+        ok = 1 if result.get("url") else 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (file_hash, row_idx, ok, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                (fhash, int(row_idx), ok, json.dumps(result, ensure_ascii=False, default=str), time.time()),
+            )
+            self._conn.commit()
+
+    def record_many(self, fhash: str, results: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        """Ghi kết quả của nhiều dòng (vd. một bài gộp) trong một transaction"""
+        now = time.time()
+        rows = [
+            (fhash, int(row_idx), 1 if result.get("url") else 0,
+             json.dumps(result, ensure_ascii=False, default=str), now)
+            for row_idx, result in results
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO entries (file_hash, row_idx, ok, result, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def _latest(self, fhash: str, since: float = 0.0) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT e.row_idx, e.ok, e.result FROM entries e"
+                " JOIN (SELECT row_idx, MAX(id) AS id FROM entries WHERE file_hash = ? AND created_at >= ?"
+                " GROUP BY row_idx) last ON e.id = last.id ORDER BY e.row_idx",
+                (fhash, since),
+            ).fetchall()
+
+    def finished_rows(self, fhash: str, include_failed: bool = True, since: float = 0.0) -> set:
+        """
+        Các dòng đã có kết quả (bỏ qua dòng lỗi nếu include_failed=False).
+        `since`: chỉ tính các bản ghi từ thời điểm này (time.time()), vd. từ lúc tạo batch shard.
+        """
+        return {row_idx for row_idx, ok, _ in self._latest(fhash, since) if ok or include_failed}
+
+    def iter_results(self, fhash: str, rows: Optional[Collection[int]] = None,
+                     batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Kết quả mới nhất của từng dòng theo thứ tự dòng, đọc từng trang `batch_size` dòng bằng một kết nối riêng,
+        không nạp hết vào bộ nhớ. Mỗi trang là một truy vấn ngắn nên không giữ khóa đọc
+        (chặn các process đang ghi journal) trong suốt lúc xuất file.
+        `rows` giới hạn các chỉ số dòng được trả về.
+        """
+        conn = connect(self.path)
+        try:
+            last_row = -1
+            while True:
+                batch = conn.execute(
+                    "SELECT e.row_idx, e.result FROM entries e"
+                    " JOIN (SELECT row_idx, MAX(id) AS id FROM entries WHERE file_hash = ? AND row_idx > ?"
+                    " GROUP BY row_idx ORDER BY row_idx LIMIT ?) last ON e.id = last.id ORDER BY e.row_idx",
+                    (fhash, last_row, batch_size),
+                ).fetchall()
+                if not batch:
+                    break
+                last_row = batch[-1][0]
+                for row_idx, result in batch:
+                    if rows is None or row_idx in rows:
+                        yield json.loads(result)
+        finally:
+            conn.close()
+
+    def clear(self, fhash: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE file_hash = ?", (fhash,))
+            self._conn.commit()
+        logger.info(f"Đã xóa journal của file {fhash[:12]}")
@@ -0,0 +1,110 @@
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Các pattern được compile một lần khi import, áp dụng theo đúng thứ tự cũ
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')          # [text](url)
+_URL_RE = re.compile(r'(https?://[^\s]+)')                   # link trực tiếp
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')                      # **text**
+_ITALIC_RE = re.compile(r'\*(.*?)\*')                        # *text*
+_CODE_RE = re.compile(r'`(.*?)`')                            # `text`
+# # ## ###: giống #{1,6} nhưng mở đầu bằng ký tự cố định nên re tìm nhanh hơn nhiều
+_HEADER_RE = re.compile(r'##{0,5}\s*')
+# list items + numbered lists trong một lượt, cho kết quả như lượt gạch đầu dòng rồi tới lượt số thứ tự:
+# - gạch đầu dòng bị xóa thì phần sau nó về đầu dòng, nên số thứ tự ngay sau ("- 1. x") cũng bị xóa
+# - khoảng trắng sau số thứ tự ("1.\n- 2. x") nuốt luôn gạch đầu dòng ở các dòng sau (lượt trước đã xóa chúng);
+#   sau một gạch, gạch tiếp theo chỉ bị xóa khi nằm ngay đầu dòng
+_BULLETS = r'[-*+](?:\s*\n[-*+])*'
+_AFTER_NUMBER = rf'(?:\s*\n\s*{_BULLETS}\s*\d+\.)*(?:\s*\n\s*{_BULLETS})?\s*'
+_LIST_RE = re.compile(rf'^\s*(?:{_BULLETS}\s*(?:\d+\.{_AFTER_NUMBER})?|\d+\.{_AFTER_NUMBER})', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n')                # dòng trống thừa
+
+# Tăng khi đổi quy tắc chuyển đổi để các kết quả chuyển đổi đã cache (stages.py) không còn được dùng
+CONVERTER_VERSION = 1
+
+# Dưới ngưỡng này chạy tuần tự, tránh chi phí khởi tạo process pool
+PROCESS_POOL_MIN_ITEMS = 5000
+PROCESS_POOL_CHUNKSIZE = 256
+
+
+def _paired_per_line(text: str, char: str) -> bool:
+    """Mọi dòng đều có số ký tự `char` chẵn"""
+    if text.count(char) % 2:
+        return False
+    return "\n" not in text or all(line.count(char) % 2 == 0 for line in text.split("\n"))
+
+
+def convert_markdown_to_plain_text(markdown_text: str) -> str:
+    """
+    Chuyển đổi Markdown thành văn bản thuần với hyperlink, kết quả giống hệt chuỗi re.sub cũ
+    (xem tests/test_markdown_text.py).
+    Mỗi bước chỉ chạy khi chuỗi có ký tự mà bước đó cần; đậm / nghiêng / code trên các dòng
+    có dấu đủ cặp được xóa bằng str.replace thay cho regex, gạch đầu dòng và danh sách đánh số
+    gộp thành một lượt.
+    """
+    if not markdown_text:
+        return markdown_text
+
+    text = markdown_text
+
+    # Chuyển đổi các link markdown [text](url) thành text (url)
+    if "](" in text:
+        text = _LINK_RE.sub(r'\1 (\2)', text)
+
+    # Chuyển đổi các link trực tiếp thành text (url)
+    if "://" in text:
+        text = _URL_RE.sub(r'(\1)', text)
+
+    # Loại bỏ các markdown formatting. **text** rồi *text* xóa dấu * theo từng cặp trên một dòng
+    # (mỗi lần khớp **...** bỏ 4 dấu), `text` cũng vậy với dấu `: dòng có số dấu chẵn thì mất hết,
+    # chỉ dòng lẻ (còn sót một dấu) mới cần regex để biết dấu nào được giữ lại
+    if "*" in text:
+        if _paired_per_line(text, "*"):
+            text = text.replace("*", "")
+        else:
+            if "**" in text:
+                text = _BOLD_RE.sub(r'\1', text)
+            text = _ITALIC_RE.sub(r'\1', text)
+    if "`" in text:
+        if _paired_per_line(text, "`"):
+            text = text.replace("`", "")
+        else:
+            text = _CODE_RE.sub(r'\1', text)
+    if "#" in text:
+        text = _HEADER_RE.sub('', text)
+    if "-" in text or "*" in text or "+" in text or "." in text:
+        text = _LIST_RE.sub('', text)
+
+    # Loại bỏ các dòng trống thừa
+    if text.count("\n") >= 3:
+        text = _BLANK_LINES_RE.sub('\n\n', text)
+
+    return text.strip()
+
+
+def convert_many(texts: Iterable[str], workers: Optional[int] = None) -> List[str]:
+    """
+    Chuyển đổi nhiều văn bản, giữ nguyên thứ tự.
+    Với danh sách lớn sẽ chia cho process pool (`workers` mặc định = số CPU).
+    Process con được tạo bằng spawn, không fork: nơi gọi (server Streamlit) có thể đang có
+    luồng job nền và kết nối SQLite mở, fork giữa lúc đó có thể làm process con kẹt khóa.
+    """
+    items = list(texts)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(items) < PROCESS_POOL_MIN_ITEMS:
+        return [convert_markdown_to_plain_text(text) for text in items]
+
+    logger.info(f"Chuyển đổi {len(items)} dòng trên {workers} process")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return list(pool.map(convert_markdown_to_plain_text, items, chunksize=PROCESS_POOL_CHUNKSIZE))
+    except Exception as e:
+        # Môi trường không cho tạo process: quay về chạy tuần tự
+        logger.warning(f"Process pool lỗi, chuyển sang chạy tuần tự: {e}")
+        return [convert_markdown_to_plain_text(text) for text in items]
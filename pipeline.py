@@ -0,0 +1,378 @@
+import heapq
+import logging
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, Any, List, NamedTuple, Optional, Iterable, Iterator, Tuple
+
+import pandas as pd
+
+from engine import PostingEngine
+from markdown_text import convert_markdown_to_plain_text
+from validation import validate_content
+from journal import Journal
+from cache import ResultCache, JobCache
+import providers
+from providers import post_rentry, post_markdown, renders_markdown, compression, PROVIDER_CHAIN
+from export import ResultWriter, open_writer, export_format
+from telemetry import trace_row
+from stages import prepare_column
+import deadline
+from deadline import row_deadline
+from http_pool import http_pool
+from profiling import RunProfiler
+from verify import iter_verified
+import bundle
+
+logger = logging.getLogger(__name__)
+
+# Một dòng chờ đăng: (chỉ số dòng, content đã strip/chuyển đổi, hợp lệ hay không)
+Row = Tuple[int, str, bool]
+# Một dòng của batch nhiều file: Row + (tên file, hash file); tên None = batch chỉ có một file
+BatchRow = Tuple[int, str, bool, Optional[str], Optional[str]]
+
+
+class InputFile(NamedTuple):
+    """Một file trong batch: các dòng chờ đăng và các dòng đã có kết quả trong journal"""
+    name: Optional[str]
+    fhash: str
+    rows: Iterable[Row]
+    skipped: set
+
+
+class JobSettings(NamedTuple):
+    """
+    Cấu hình áp cho từng dòng của một job, chụp lại khi tạo job: phiên Streamlit khác
+    đổi cấu hình sau đó không làm thay đổi các dòng của job đang chạy
+    """
+    row_budget: float
+    gzip_min_bytes: int
+    connect_timeout: float
+    read_timeout: float
+    # Gộp tối đa bundle_rows dòng / bundle_bytes byte vào một bài (xem bundle), 0 hoặc 1 = không gộp
+    bundle_rows: int = 0
+    bundle_bytes: int = bundle.DEFAULT_BUNDLE_BYTES
+
+    @classmethod
+    def current(cls) -> "JobSettings":
+        """Cấu hình toàn cục hiện tại (CLI / worker đặt bằng các hàm configure)"""
+        return cls(row_budget=deadline.ROW_BUDGET, gzip_min_bytes=providers.GZIP_MIN_BYTES,
+                   connect_timeout=http_pool.connect_timeout, read_timeout=http_pool.read_timeout,
+                   bundle_rows=bundle.BUNDLE_ROWS, bundle_bytes=bundle.BUNDLE_BYTES)
+
+
+@contextmanager
+def row_settings(settings: JobSettings) -> Iterator[None]:
+    """Áp cấu hình của job cho dòng đang xử lý trên thread hiện tại"""
+    # Mọi provider / retry / chờ rate limit của dòng chia nhau một hạn chót chung
+    with row_deadline(settings.row_budget), compression(settings.gzip_min_bytes), \
+            http_pool.request_timeout(settings.connect_timeout, settings.read_timeout):
+        yield
+
+
+def post_row(idx: int, raw: Any, convert: bool = True, cache: Optional[ResultCache] = None,
+             valid: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Xử lý một dòng Excel: chuyển đổi, kiểm tra và đăng bài, trả về một dòng kết quả.
+    `valid` là kết quả kiểm tra đã tính sẵn cho cả cột (None = tự kiểm tra).
+    """
+    content = str(raw).strip()
+
+    # Chuyển đổi Markdown nếu được chọn
+    if convert:
+        content = convert_markdown_to_plain_text(content)
+
+    if valid is None:
+        valid = validate_content(content)
+
+    if not valid:
+        # Debug info cho content không hợp lệ
+        debug_info = f"Content: '{content[:50]}...' (Length: {len(content)})"
+        logger.warning(f"Dòng {idx + 1} content không hợp lệ: {debug_info}")
+        return {
+            "row": idx+1, 
+            "status": "❌ Content không hợp lệ", 
+            "url": None, 
+            "edit_code": None,
+            "error": f"Content quá ngắn hoặc trống - {debug_info}"
+        }
+
+    logger.info(f"Đang xử lý dòng {idx + 1}")
+    try:
+        if cache is not None:
+            res = cache.get_or_post(content, post_rentry)
+        else:
+            res = post_rentry(content)
+    except Exception as e:
+        res = {"error": f"Exception: {e}"}
+
+    if "url" in res:
+        logger.info(f"Dòng {idx + 1} thành công: {res['url']}")
+    else:
+        logger.error(f"Dòng {idx + 1} lỗi: {res}")
+    return result_row(idx, res)
+
+def result_row(idx: int, res: Dict[str, Any], anchor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Dòng kết quả từ kết quả đăng bài `res`; `anchor` là vị trí của dòng trong bài gộp (xem bundle).
+    Link của dòng chỉ kèm #anchor khi bài gộp nằm trên provider hiển thị Markdown.
+    """
+    if "url" in res:
+        result = {
+            "row": idx+1,
+            "status": "✅ Thành công",
+            "url": res["url"],
+            "edit_code": res.get("edit_code", "N/A"),
+            "method": res.get("method", "API"),
+            "cached": bool(res.get("cached", False)),
+            "tried": " → ".join(res.get("tried", []))
+        }
+        if anchor is not None:
+            url = f"{res['url']}#{anchor}" if renders_markdown(res) else res["url"]
+            result.update(url=url, bundle_url=res["url"], anchor=anchor)
+        return result
+
+    return {
+        "row": idx+1,
+        "status": "⏱ Hết thời gian" if res.get("budget_exceeded") else f"❌ Lỗi",
+        "url": None,
+        "edit_code": None,
+        "error": str(res.get("error", "Unknown error")),
+        "tried": " → ".join(res.get("tried", []))
+    }
+
+def process_row(item, convert: bool = True, journal: Optional[Journal] = None, fhash: Optional[str] = None,
+                cache: Optional[ResultCache] = None, settings: Optional[JobSettings] = None) -> Dict[str, Any]:
+    """
+    Đăng một dòng và ghi ngay kết quả vào journal (nếu có) để có thể resume
+    """
+    idx, raw, valid = item
+    with trace_row() as trace, row_settings(settings or JobSettings.current()):
+        result = post_row(idx, raw, convert, cache, valid)
+    # Thời gian từng lần thử provider / request / sleep của dòng này
+    result.update(trace.summary())
+    result["spans"] = trace.spans
+    if journal is not None:
+        journal.record(fhash, idx, result)
+    return result
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+def prepare_rows(chunks: Iterable[pd.Series], convert: bool = True,
+                 skip: Optional[set] = None) -> Iterator[Row]:
+    """
+    Chuyển đổi và kiểm tra từng khối của cột content (xem stages.prepare_column), yield các dòng chờ đăng.
+    Các khối được xử lý ngay khi đọc xong nên dòng đầu có thể được đăng trước khi đọc hết file.
+    Mỗi khối được chuyển đổi tuần tự: các khối sau được đọc trong lúc luồng đăng bài và kết nối SQLite
+    đang chạy, không fork process pool mới cho từng khối.
+    """
+    skip = skip or set()
+    offset = 0
+    for chunk in chunks:
+        prepared = prepare_column(chunk, convert=convert, workers=1)
+        positions = [i for i in range(len(chunk)) if offset + i not in skip]
+        contents = prepared.content.iloc[positions].tolist()
+        valid_flags = prepared.valid.iloc[positions].tolist()
+        for i, content, valid in zip(positions, contents, valid_flags):
+            yield offset + i, content, valid
+        offset += len(chunk)
+
+def post_batch_row(item: BatchRow, journal: Optional[Journal] = None, cache: Optional[ResultCache] = None,
+                   settings: Optional[JobSettings] = None) -> Dict[str, Any]:
+    idx, content, valid, name, fhash = item
+    result = process_row((idx, content, valid), convert=False, journal=journal, fhash=fhash, cache=cache,
+                         settings=settings)
+    if name is not None:
+        result["file"] = name
+    return result
+
+def post_bundle(items: List[BatchRow], journal: Optional[Journal] = None, cache: Optional[ResultCache] = None,
+                settings: Optional[JobSettings] = None) -> List[Dict[str, Any]]:
+    """
+    Đăng nhiều dòng hợp lệ liên tiếp (cùng một file) thành một bài, mỗi dòng một heading
+    (xem bundle.render); mỗi dòng nhận link bài gộp kèm anchor của mình.
+    Bài gộp được đăng lên provider hiển thị Markdown trước (xem providers.post_markdown).
+    """
+    if len(items) == 1:
+        return [post_batch_row(items[0], journal, cache, settings)]
+    text = bundle.render((idx, content) for idx, content, *_ in items)
+    first, last = items[0][0] + 1, items[-1][0] + 1
+    logger.info(f"Đang xử lý dòng {first}-{last} (gộp {len(items)} dòng)")
+    with trace_row() as trace, row_settings(settings or JobSettings.current()):
+        try:
+            res = cache.get_or_post(text, post_markdown) if cache is not None else post_markdown(text)
+        except Exception as e:
+            res = {"error": f"Exception: {e}"}
+    if "url" in res:
+        logger.info(f"Dòng {first}-{last} thành công: {res['url']}")
+    else:
+        logger.error(f"Dòng {first}-{last} lỗi: {res}")
+
+    timing = trace.summary()
+    results = []
+    for i, (idx, _, _, name, _) in enumerate(items):
+        result = result_row(idx, res, bundle.anchor(idx))
+        result.update(timing)
+        # Các lần thử chỉ tính một lần cho cả bài gộp (dòng đầu)
+        result["spans"] = trace.spans if i == 0 else []
+        if name is not None:
+            result["file"] = name
+        results.append(result)
+    if journal is not None:
+        journal.record_many(items[0][4], [(idx, result) for (idx, *_), result in zip(items, results)])
+    return results
+
+def iter_batch_results(items: Iterable[BatchRow], concurrency: int = 4, journal: Optional[Journal] = None,
+                       cache: Optional[ResultCache] = None, verify_concurrency: int = 0,
+                       settings: Optional[JobSettings] = None) -> Iterator[Tuple[BatchRow, Dict[str, Any]]]:
+    """
+    Đăng các dòng (có thể của nhiều file) trên cùng một engine, yield (dòng, kết quả) theo thứ tự đầu vào.
+    Content trong `items` đã được chuyển đổi sẵn (xem prepare_rows). Khi bật bundle, các dòng liên tiếp
+    được gộp thành một bài (xem bundle.iter_bundles); dòng bị đăng lại sau khi kiểm tra thì đăng riêng.
+    `verify_concurrency` > 0: tải lại từng link (tối đa chừng đó link song song) để kiểm tra nội dung,
+    dòng có link sai được đăng lại (xem verify.iter_verified).
+    `settings`: cấu hình của job (mặc định là cấu hình toàn cục lúc bắt đầu đăng).
+    """
+    settings = settings or JobSettings.current()
+    post = partial(post_batch_row, journal=journal, cache=cache, settings=settings)
+    if settings.bundle_rows > 1:
+        bundles = bundle.iter_bundles(items, settings.bundle_rows, settings.bundle_bytes)
+        post_group = partial(post_bundle, journal=journal, cache=cache, settings=settings)
+        posted = PostingEngine(post_group, concurrency=concurrency).run(bundles)
+        posted = ((item, result) for group, results in posted for item, result in zip(group, results))
+    else:
+        posted = PostingEngine(post, concurrency=concurrency).run(items)
+    if verify_concurrency <= 0:
+        yield from posted
+        return
+
+    def repost(item: BatchRow) -> Dict[str, Any]:
+        if cache is not None:
+            cache.discard(item[1])
+        return post(item)
+
+    for item, result in iter_verified(posted, repost, verify_concurrency):
+        if journal is not None and "verified" in result:
+            journal.record(item[4], item[0], result)
+        yield item, result
+
+def iter_results(rows: Iterable[Row], concurrency: int = 4, journal: Optional[Journal] = None,
+                 fhash: Optional[str] = None, cache: Optional[ResultCache] = None,
+                 verify_concurrency: int = 0) -> Iterator[Dict[str, Any]]:
+    """Như iter_batch_results cho các dòng của một file, chỉ yield kết quả"""
+    items = ((idx, content, valid, None, fhash) for idx, content, valid in rows)
+    for _, result in iter_batch_results(items, concurrency, journal=journal, cache=cache,
+                                        verify_concurrency=verify_concurrency):
+        yield result
+
+def merge_results(previous: Iterable[Dict[str, Any]], posted: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Trộn kết quả cũ trong journal với kết quả vừa đăng theo thứ tự dòng.
+    Cả hai nguồn đều đã theo thứ tự dòng nên chỉ cần đọc dần từng bên.
+    """
+    return heapq.merge(previous, posted, key=lambda r: r["row"])
+
+def merge_batch_results(files: List[InputFile], posted: Iterable[Tuple[BatchRow, Dict[str, Any]]],
+                        journal: Optional[Journal] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Như merge_results cho nhiều file: `posted` theo thứ tự file rồi thứ tự dòng,
+    kết quả của từng file được trộn với các dòng `skipped` của file đó trong journal.
+    """
+    posted = iter(posted)
+    head = None
+
+    def current(fhash: str) -> Iterator[Dict[str, Any]]:
+        nonlocal head
+        while True:
+            if head is None:
+                head = next(posted, None)
+                if head is None:
+                    return
+            item, result = head
+            if item[4] != fhash:
+                return
+            head = None
+            yield result
+
+    for f in files:
+        previous = ()
+        if journal is not None and f.skipped:
+            previous = journal.iter_results(f.fhash, rows=f.skipped)
+            if f.name is not None:
+                previous = (dict(r, file=f.name) for r in previous)
+        yield from merge_results(previous, current(f.fhash))
+
+def export_results(results: Iterable[Dict[str, Any]], path: str, fmt: Optional[str] = None,
+                   files: Optional[List[str]] = None) -> ResultWriter:
+    """
+    Ghi dần `results` ra file kết quả, trả về writer (đã đóng) để lấy số liệu tổng hợp.
+    `files`: tên các file của batch nhiều file (mỗi file một sheet + sheet Summary).
+    """
+    with open_writer(path, fmt, providers=[name for name, _ in PROVIDER_CHAIN], files=files) as writer:
+        for result in results:
+            writer.write(result)
+    return writer
+
+def unique_names(names: Iterable[str]) -> List[str]:
+    """Tên file dùng làm khóa trong batch: trùng tên thì thêm (2), (3)..."""
+    seen: Dict[str, int] = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return unique
+
+def run_batch_job(job, files: List[InputFile], concurrency: int = 4,
+                  journal: Optional[Journal] = None, cache: Optional[ResultCache] = None,
+                  output: Optional[str] = None, fmt: Optional[str] = None,
+                  profile: Optional[str] = None, verify_concurrency: int = 0,
+                  settings: Optional[JobSettings] = None) -> Dict[str, Any]:
+    """
+    Hàm chạy nền cho jobs.JobManager: đăng các dòng của mọi file trong `files` trên cùng một engine
+    (chung concurrency và rate limit, file nhỏ không phải chờ file trước xong hẳn), cập nhật tiến độ
+    của job và dừng khi job bị hủy. Kết quả (gồm cả các dòng `skipped` đã có trong journal)
+    được ghi dần ra file `output` ngay khi từng dòng xong.
+    Nếu có `profile`, cả lần chạy được profile và ghi vào file zip đó (xem profiling.RunProfiler).
+    `settings` được chụp khi tạo job (xem JobSettings), không đọc lại cấu hình toàn cục khi job bắt đầu chạy.
+    """
+    if profile:
+        with RunProfiler() as profiler:
+            result = run_batch_job(job, files, concurrency, journal=journal, cache=cache,
+                                   output=output, fmt=fmt, verify_concurrency=verify_concurrency,
+                                   settings=settings)
+        result["profile"] = profiler.save(profile)
+        return result
+
+    # Cache dùng chung giữa các job, số hit / miss đếm riêng cho job này
+    cache = JobCache(cache) if cache is not None else None
+    items = ((idx, content, valid, f.name, f.fhash) for f in files for idx, content, valid in f.rows)
+    results = iter_batch_results(items, concurrency, journal=journal, cache=cache,
+                                 verify_concurrency=verify_concurrency, settings=settings)
+
+    def posted():
+        for item, result in results:
+            job.advance(bool(result.get("url")), result={k: v for k, v in result.items() if k != "spans"})
+            yield item, result
+            if job.cancelled:
+                logger.info(f"Job {job.id} bị hủy sau {job.done}/{job.total} dòng")
+                break
+
+    names = [f.name for f in files if f.name is not None]
+    try:
+        writer = export_results(merge_batch_results(files, posted(), journal), output, fmt, files=names or None)
+    finally:
+        # Đóng generator để bỏ các dòng chưa kịp chạy
+        results.close()
+    return {
+        "output": output,
+        "format": export_format(output, fmt),
+        "summary": writer.summary(),
+        "files": writer.file_summary() if names else None,
+        "providers": writer.providers.table(),
+        "cache": cache.stats() if cache is not None else None,
+        "profile": None,
+    }
@@ -0,0 +1,167 @@
+import io
+import os
+import re
+import sys
+import time
+import pstats
+import zipfile
+import cProfile
+import threading
+import tracemalloc
+import logging
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Chu kỳ lấy mẫu stack của mọi thread (giây)
+SAMPLE_INTERVAL = 0.005
+# Kiểm tra bộ nhớ mỗi chừng này giây, chụp snapshot mới khi vượt đỉnh cũ 10%
+MEMORY_CHECK_INTERVAL = 0.5
+MEMORY_GROWTH = 1.1
+TOP_STATS = 50
+
+_THREAD_SUFFIX_RE = re.compile(r"[_-]?\d+$")
+
+# cProfile (Python >= 3.12 chỉ cho một profiler hoạt động) và tracemalloc là trạng thái của cả process:
+# mỗi lúc chỉ một lần chạy được profile, lần khác chờ đến lượt
+_active = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """
+    Lấy mẫu stack của mọi thread (poster, job, Streamlit...) theo chu kỳ, đếm theo dạng
+    collapsed stack "thread;hàm;hàm con N" để vẽ flamegraph (flamegraph.pl, speedscope).
+    Đồng thời theo dõi tracemalloc và giữ snapshot gần đỉnh bộ nhớ nhất.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, track_memory: bool = True):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.track_memory = track_memory
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_bytes = 0
+        self._snapshot_bytes = 0
+        self._halt = threading.Event()
+
+    def _sample(self) -> None:
+        names = {t.ident: _THREAD_SUFFIX_RE.sub("", t.name) for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _check_memory(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak)
+        if self.peak_snapshot is None or current >= self._snapshot_bytes * MEMORY_GROWTH:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self._snapshot_bytes = current
+
+    def run(self) -> None:
+        last_memory = 0.0
+        while not self._halt.wait(self.interval):
+            self._sample()
+            now = time.monotonic()
+            if self.track_memory and now - last_memory >= MEMORY_CHECK_INTERVAL:
+                last_memory = now
+                self._check_memory()
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+        if self.track_memory:
+            self._check_memory()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RunProfiler:
+    """
+    Bọc một lần chạy: cProfile cho thread gọi (job / CLI), lấy mẫu stack mọi thread
+    và tracemalloc. save() ghi tất cả vào một file zip để tải về.
+    Các lần chạy có profile (vd. hai job cùng lúc) được xếp hàng, không chạy chồng lên nhau.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, track_memory: bool = True):
+        self.track_memory = track_memory
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval, track_memory)
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._owns_tracemalloc = False
+
+    def __enter__(self) -> "RunProfiler":
+        if not _active.acquire(blocking=False):
+            logger.info("Đang có lần chạy khác được profile, chờ đến lượt")
+            _active.acquire()
+        try:
+            if self.track_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+            self.started = time.perf_counter()
+            self.sampler.start()
+            self.profile.enable()
+        except BaseException:
+            _active.release()
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.profile.disable()
+            self.sampler.stop()
+            self.elapsed = time.perf_counter() - self.started
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _active.release()
+
+    def summary(self) -> str:
+        lines = [
+            f"Thời gian chạy: {self.elapsed:.2f}s",
+            f"Số mẫu stack: {self.sampler.samples} (mỗi {self.sampler.interval * 1000:.0f}ms)",
+        ]
+        if self.track_memory:
+            lines.append(f"Đỉnh bộ nhớ (tracemalloc): {self.sampler.peak_bytes / 1e6:.1f} MB")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str) -> str:
+        """
+        Ghi file zip gồm:
+        profile.pstats (cProfile, mở bằng pstats / snakeviz), profile.txt (top hàm theo cumtime),
+        stacks.collapsed (mọi thread, cho flamegraph), memory_peak.tracemalloc + memory_top.txt
+        """
+        stats_text = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stats_text)
+        stats.sort_stats("cumulative").print_stats(TOP_STATS)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("summary.txt", self.summary())
+            archive.writestr("profile.txt", stats_text.getvalue())
+            pstats_path = f"{path}.pstats"
+            stats.dump_stats(pstats_path)
+            archive.write(pstats_path, "profile.pstats")
+            os.remove(pstats_path)
+            archive.writestr("stacks.collapsed", self.sampler.collapsed())
+            snapshot = self.sampler.peak_snapshot
+            if snapshot is not None:
+                top = snapshot.statistics("lineno")[:TOP_STATS]
+                archive.writestr("memory_top.txt", "".join(f"{stat}\n" for stat in top))
+                snapshot_path = f"{path}.tracemalloc"
+                snapshot.dump(snapshot_path)
+                archive.write(snapshot_path, "memory_peak.tracemalloc")
+                os.remove(snapshot_path)
+        logger.info(f"Đã ghi profile vào {path}")
+        return path
@@ -0,0 +1,486 @@
+import os
+import re
+import gzip
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Callable
+
+import requests
+
+from routing import router
+from engine import rate_limiter
+from validation import validate_content
+from http_pool import http_pool
+import deadline
+
+logger = logging.getLogger(__name__)
+
+# Endpoint của từng provider, có thể thay bằng biến môi trường RENTRY_ENDPOINTS (JSON)
+# hoặc configure_endpoints() để chạy với server giả lập (xem bench/stub_server.py)
+DEFAULT_ENDPOINTS = {
+    "dpaste": "https://dpaste.com/api/v2/",
+    "rentry": "https://rentry.co",
+    "rentry_api": "https://rentry.co/api/new",
+    "0x0.st": "https://0x0.st",
+    "pastebin": "https://pastebin.com/api/api_post.php",
+}
+ENDPOINTS = dict(DEFAULT_ENDPOINTS)
+
+def configure_endpoints(overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Thay endpoint của một số provider, None = quay về mặc định"""
+    ENDPOINTS.clear()
+    ENDPOINTS.update(DEFAULT_ENDPOINTS)
+    if overrides:
+        unknown = set(overrides) - set(DEFAULT_ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Provider không tồn tại: {sorted(unknown)}")
+        ENDPOINTS.update(overrides)
+    return dict(ENDPOINTS)
+
+if os.environ.get("RENTRY_ENDPOINTS"):
+    configure_endpoints(json.loads(os.environ["RENTRY_ENDPOINTS"]))
+
+# Giới hạn kích thước nội dung mỗi provider nhận: (giới hạn, đơn vị "chars" hoặc "bytes" UTF-8).
+# Dòng vượt giới hạn không được gửi tới provider đó; có thể thay bằng RENTRY_SIZE_LIMITS (JSON)
+DEFAULT_SIZE_LIMITS = {
+    "dpaste": (250_000, "bytes"),
+    "rentry_api": (200_000, "chars"),
+    "rentry_session": (200_000, "chars"),
+    "rentry_form": (200_000, "chars"),
+    "selenium": (200_000, "chars"),
+    "0x0.st": (512 * 1024 * 1024, "bytes"),
+    "pastebin": (512 * 1024, "bytes"),
+}
+SIZE_LIMITS = dict(DEFAULT_SIZE_LIMITS)
+_size_lock = threading.Lock()
+
+# Nén gzip khi upload file lên 0x0.st với nội dung từ chừng này byte (0 = tắt).
+# Link 0x0.st khi đó trỏ tới file .gz chứ không phải văn bản thuần.
+GZIP_MIN_BYTES = int(os.environ.get("RENTRY_GZIP_MIN_BYTES", "0"))
+
+def configure_size_limits(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[int, str]]:
+    """Thay giới hạn kích thước (số hoặc [số, đơn vị]) của một số provider, None = quay về mặc định"""
+    with _size_lock:
+        SIZE_LIMITS.clear()
+        SIZE_LIMITS.update(DEFAULT_SIZE_LIMITS)
+        for name, limit in (overrides or {}).items():
+            if name not in DEFAULT_SIZE_LIMITS:
+                raise ValueError(f"Provider không tồn tại: {name}")
+            if isinstance(limit, (list, tuple)):
+                SIZE_LIMITS[name] = (int(limit[0]), limit[1])
+            else:
+                SIZE_LIMITS[name] = (int(limit), DEFAULT_SIZE_LIMITS[name][1])
+        return dict(SIZE_LIMITS)
+
+def configure_compression(min_bytes: int) -> None:
+    global GZIP_MIN_BYTES
+    GZIP_MIN_BYTES = max(0, int(min_bytes))
+
+_local = threading.local()
+
+@contextmanager
+def compression(min_bytes: int) -> Iterator[None]:
+    """Ngưỡng nén gzip cho các upload trên thread hiện tại (cấu hình của job đang đăng dòng này)"""
+    previous = getattr(_local, "gzip_min_bytes", None)
+    _local.gzip_min_bytes = max(0, int(min_bytes))
+    try:
+        yield
+    finally:
+        _local.gzip_min_bytes = previous
+
+def gzip_min_bytes() -> int:
+    value = getattr(_local, "gzip_min_bytes", None)
+    return GZIP_MIN_BYTES if value is None else value
+
+if os.environ.get("RENTRY_SIZE_LIMITS"):
+    configure_size_limits(json.loads(os.environ["RENTRY_SIZE_LIMITS"]))
+
+def content_size(content: str, unit: str) -> int:
+    return len(content) if unit == "chars" else len(content.encode("utf-8"))
+
+def fits(name: str, content: str) -> bool:
+    """Content có nằm trong giới hạn kích thước của provider không (provider lạ = không giới hạn)"""
+    limit = SIZE_LIMITS.get(name)
+    return limit is None or content_size(content, limit[1]) <= limit[0]
+
+def note_too_large(name: str, content: str, response: Any) -> None:
+    """
+    Provider trả 413: hạ giới hạn của provider xuống dưới kích thước vừa bị từ chối
+    để các dòng lớn hơn sau đó không phải upload thử nữa
+    """
+    if response is None or response.status_code != 413:
+        return
+    with _size_lock:
+        limit, unit = SIZE_LIMITS.get(name, (None, "bytes"))
+        size = content_size(content, unit)
+        if limit is None or size <= limit:
+            SIZE_LIMITS[name] = (max(0, size - 1), unit)
+            logger.warning(f"{name}: 413 với {size} {unit}, giới hạn mới {size - 1}")
+
+# Selenium chỉ được thử khi dòng còn ít nhất chừng này giây
+SELENIUM_MIN_BUDGET = 20.0
+
+def rentry_marker() -> str:
+    """Phần 'host/path/' của rentry dùng để nhận ra URL bài đăng (vd. 'rentry.co/')"""
+    return ENDPOINTS["rentry"].split("://", 1)[-1].rstrip("/") + "/"
+
+# Headers giả lập trình duyệt
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Origin": "https://rentry.co",
+    "Referer": "https://rentry.co/",
+    "Connection": "keep-alive"
+}
+
+_session_warmup_lock = threading.Lock()
+
+def get_rentry_session() -> requests.Session:
+    """
+    Session rentry có cookies, chỉ lấy trang chủ một lần cho cả batch
+    """
+    session = http_pool.session(ENDPOINTS["rentry"], name="rentry-session")
+    with _session_warmup_lock:
+        if not getattr(session, "warmed_up", False):
+            session.headers.update(HEADERS)
+            rate_limiter.acquire("rentry")
+            http_pool.get(ENDPOINTS["rentry"], name="rentry-session")
+            session.warmed_up = True
+    return session
+
+def post_rentry_with_session(content: str) -> Dict[str, Any]:
+    """
+    Thử đăng bài với session để duy trì cookies
+    """
+    logger.info("Thử với session mode")
+    try:
+        get_rentry_session()
+        
+        # Thử API với session
+        rate_limiter.acquire("rentry")
+        r = http_pool.post(ENDPOINTS["rentry_api"], name="rentry-session", data={"text": content})
+        rate_limiter.honor_retry_after("rentry", r)
+        note_too_large("rentry_session", content, r)
+        if r.status_code == 413:
+            return {"error": "Session mode fail: 413 (nội dung quá lớn)"}
+        logger.info(f"Session API: Status {r.status_code}")
+        
+        if r.status_code == 200:
+            try:
+                result = r.json()
+                logger.info("Session API thành công")
+                return result
+            except Exception:
+                pass
+        
+        # Thử form với session
+        rate_limiter.acquire("rentry")
+        r = http_pool.post(ENDPOINTS["rentry"], name="rentry-session", data={"text": content})
+        rate_limiter.honor_retry_after("rentry", r)
+        logger.info(f"Session Form: Status {r.status_code}, URL: {r.url}")
+        
+        if r.status_code == 200 and rentry_marker() in r.url:
+            return {"url": r.url, "edit_code": "Session mode", "method": "session"}
+        
+        return {"error": f"Session mode fail: {r.status_code}"}
+        
+    except Exception as e:
+        logger.error(f"Session Exception: {e}")
+        return {"error": f"Session Exception: {e}"}
+
+def post_rentry_api(content: str, max_retries: int = 2) -> Dict[str, Any]:
+    """
+    Đăng bài qua rentry API, retry khi lỗi
+    """
+    data = {"text": content.strip()}
+    error = "Rentry API fail"
+    for attempt in range(max_retries):
+        try:
+            rate_limiter.acquire("rentry")
+            r = http_pool.post(ENDPOINTS["rentry_api"], data=data, headers=HEADERS)
+            rate_limiter.honor_retry_after("rentry", r)
+            note_too_large("rentry_api", content, r)
+            if r.status_code == 413:
+                return {"error": "Rentry API failed: 413 (nội dung quá lớn)"}
+            logger.info(f"Rentry API attempt {attempt + 1}: Status {r.status_code}")
+            
+            if r.status_code == 200:
+                try:
+                    result = r.json()
+                    logger.info("Rentry API thành công")
+                    return result
+                except Exception as e:
+                    logger.warning(f"Rentry API trả về không phải JSON: {e}")
+                    error = f"Rentry API trả về không phải JSON: {e}"
+            else:
+                logger.warning(f"Rentry API failed với status {r.status_code}")
+                error = f"Rentry API failed: {r.status_code}"
+                    
+        except Exception as e:
+            logger.error(f"Rentry API Exception attempt {attempt + 1}: {e}")
+            error = f"Rentry API Exception: {e}"
+        
+        # Delay trước khi retry
+        if attempt < max_retries - 1:
+            deadline.backoff(attempt, 2.0, "rentry_api")
+    
+    return {"error": error}
+
+def post_rentry_form(content: str) -> Dict[str, Any]:
+    """
+    Fallback: giả lập submit form web với nhiều phương thức
+    """
+    logger.info("Chuyển sang form mode")
+    
+    # Thử nhiều phương thức khác nhau
+    base = ENDPOINTS["rentry"].rstrip("/")
+    marker = rentry_marker()
+    methods = [
+        {"url": base, "data": {"text": content}},
+        {"url": base + "/", "data": {"text": content}},
+        {"url": base + "/new", "data": {"text": content}},
+    ]
+    
+    for i, method in enumerate(methods):
+        try:
+            logger.info(f"Form method {i+1}: {method['url']}")
+            
+            # Headers khác nhau cho từng phương thức
+            headers = HEADERS.copy()
+            if i == 1:
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+            elif i == 2:
+                headers["X-Requested-With"] = "XMLHttpRequest"
+            
+            rate_limiter.acquire("rentry")
+            r = http_pool.post(method["url"], data=method["data"], headers=headers)
+            rate_limiter.honor_retry_after("rentry", r)
+            note_too_large("rentry_form", content, r)
+            if r.status_code == 413:
+                return {"error": "Form mode fail: 413 (nội dung quá lớn)"}
+            logger.info(f"Form method {i+1}: Status {r.status_code}, URL: {r.url}")
+            
+            if r.status_code == 200:
+                # Kiểm tra response có chứa link rentry không
+                if marker in r.url or marker in r.text:
+                    # Tìm link trong response
+                    link_match = re.search(re.escape(base) + r'/[a-zA-Z0-9]+', r.text)
+                    if link_match:
+                        return {
+                            "url": link_match.group(), 
+                            "edit_code": "Chỉ có khi dùng API", 
+                            "method": f"form_{i+1}"
+                        }
+                    elif marker in r.url:
+                        return {
+                            "url": r.url, 
+                            "edit_code": "Chỉ có khi dùng API", 
+                            "method": f"form_{i+1}"
+                        }
+            
+            # Nếu không thành công, thử phương thức tiếp theo
+            if i < len(methods) - 1:
+                deadline.backoff(i, 1.0, "rentry_form")  # Delay giữa các attempts
+                
+        except Exception as e:
+            logger.error(f"Form method {i+1} Exception: {e}")
+            if i == len(methods) - 1:  # Lần cuối cùng
+                return {"error": f"Tất cả form methods đều fail: {e}"}
+    
+    return {"error": f"Form mode fail: 403 - Tất cả phương thức đều bị từ chối"}
+
+def post_rentry_selenium(content: str) -> Dict[str, Any]:
+    """
+    Phương thức Selenium: Giả lập trình duyệt thật
+    """
+    logger.info("Thử với Selenium mode")
+    left = deadline.remaining()
+    if left is not None and left < SELENIUM_MIN_BUDGET:
+        # Mở Chrome tốn nhiều giây, không đủ thời gian thì bỏ qua luôn
+        return {"error": f"Selenium bỏ qua: chỉ còn {left:.0f}s cho dòng này"}
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.chrome.options import Options
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        
+        # Cấu hình Chrome headless
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+        
+        driver = None
+        try:
+            driver = webdriver.Chrome(options=chrome_options)
+            driver.set_page_load_timeout(deadline.clip(30))
+            rate_limiter.acquire("rentry")
+            driver.get(ENDPOINTS["rentry"])
+            
+            # Tìm textarea và nhập content
+            wait = WebDriverWait(driver, deadline.clip(10))
+            textarea = wait.until(EC.presence_of_element_located((By.NAME, "text")))
+            textarea.clear()
+            textarea.send_keys(content)
+            
+            # Tìm và click submit button
+            submit_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
+            submit_button.click()
+            
+            # Chờ redirect và lấy URL
+            wait.until(lambda driver: rentry_marker() in driver.current_url)
+            result_url = driver.current_url
+            
+            logger.info(f"Selenium thành công: {result_url}")
+            return {"url": result_url, "edit_code": "Selenium mode", "method": "selenium"}
+            
+        except TimeoutException:
+            logger.error("Selenium timeout - không tìm thấy element")
+            return {"error": "Selenium timeout"}
+        except WebDriverException as e:
+            logger.error(f"Selenium WebDriver error: {e}")
+            return {"error": f"Selenium WebDriver error: {e}"}
+        finally:
+            if driver:
+                driver.quit()
+                
+    except ImportError:
+        logger.warning("Selenium không được cài đặt")
+        return {"error": "Selenium không khả dụng - cần cài đặt selenium"}
+    except Exception as e:
+        logger.error(f"Selenium Exception: {e}")
+        return {"error": f"Selenium Exception: {e}"}
+
+def post_dpaste(content: str) -> Dict[str, Any]:
+    """
+    Đăng bài lên dpaste.com - phương thức chính
+    """
+    logger.info("Đăng bài lên dpaste.com")
+    try:
+        data = {"content": content, "syntax": "text"}
+        rate_limiter.acquire("dpaste")
+        r = http_pool.post(ENDPOINTS["dpaste"], data=data)
+        rate_limiter.honor_retry_after("dpaste", r)
+        note_too_large("dpaste", content, r)
+        logger.info(f"Dpaste API: Status {r.status_code}")
+        
+        if r.status_code == 201:
+            result_url = r.text.strip()
+            logger.info(f"Dpaste thành công: {result_url}")
+            return {"url": result_url, "edit_code": "Dpaste API", "method": "dpaste"}
+        else:
+            return {"error": f"Dpaste API failed: {r.status_code}", "raw": r.text[:200]}
+            
+    except Exception as e:
+        logger.error(f"Dpaste Exception: {e}")
+        return {"error": f"Dpaste Exception: {e}"}
+
+def post_0x0(content: str) -> Dict[str, Any]:
+    """
+    Đăng file lên 0x0.st
+    """
+    try:
+        payload = content.encode()
+        method = "0x0.st"
+        files = {"file": payload}
+        threshold = gzip_min_bytes()
+        if threshold and len(payload) >= threshold:
+            # 0x0.st lưu nguyên file upload: nén gzip giảm băng thông, link trả về là file .gz
+            files = {"file": ("paste.txt.gz", gzip.compress(payload, compresslevel=6), "application/gzip")}
+            method = "0x0.st+gzip"
+        rate_limiter.acquire("0x0.st")
+        r = http_pool.post(ENDPOINTS["0x0.st"], files=files)
+        rate_limiter.honor_retry_after("0x0.st", r)
+        note_too_large("0x0.st", content, r)
+        if r.status_code == 200:
+            result_url = r.text.strip()
+            logger.info(f"0x0.st thành công: {result_url}")
+            return {"url": result_url, "edit_code": "0x0.st mode", "method": method}
+        return {"error": f"0x0.st failed: {r.status_code}"}
+    except Exception as e:
+        logger.warning(f"0x0.st failed: {e}")
+        return {"error": f"0x0.st Exception: {e}"}
+
+def post_pastebin(content: str) -> Dict[str, Any]:
+    """
+    Đăng bài lên pastebin.com
+    """
+    try:
+        data = {"api_dev_key": "anonymous", "api_option": "paste", "api_paste_code": content}
+        rate_limiter.acquire("pastebin")
+        r = http_pool.post(ENDPOINTS["pastebin"], data=data)
+        rate_limiter.honor_retry_after("pastebin", r)
+        note_too_large("pastebin", content, r)
+        if r.status_code == 200 and "http" in r.text:
+            result_url = r.text.strip()
+            logger.info(f"Pastebin thành công: {result_url}")
+            return {"url": result_url, "edit_code": "Pastebin mode", "method": "pastebin"}
+        return {"error": f"Pastebin failed: {r.status_code}"}
+    except Exception as e:
+        logger.warning(f"Pastebin failed: {e}")
+        return {"error": f"Pastebin Exception: {e}"}
+
+# Chuỗi provider mặc định (thứ tự ưu tiên khi chưa có số liệu sức khỏe)
+PROVIDER_CHAIN = [
+    ("dpaste", post_dpaste),
+    ("rentry_api", post_rentry_api),
+    ("rentry_session", post_rentry_with_session),
+    ("rentry_form", post_rentry_form),
+    ("selenium", post_rentry_selenium),
+    ("0x0.st", post_0x0),
+    ("pastebin", post_pastebin),
+]
+
+# Provider hiển thị Markdown: heading của bài gộp có anchor (#row-N) để link tới từng dòng
+MARKDOWN_PROVIDERS = ("rentry_api", "rentry_session", "rentry_form", "selenium")
+
+def renders_markdown(result: Dict[str, Any]) -> bool:
+    """Bài đăng thành công có nằm trên provider hiển thị Markdown không (provider cuối trong `tried`)"""
+    tried = result.get("tried") or []
+    return bool(tried) and tried[-1] in MARKDOWN_PROVIDERS
+
+def post_rentry(content: str, chain: Optional[List[Tuple[str, Callable[[str], Dict[str, Any]]]]] = None) -> Dict[str, Any]:
+    """
+    Đăng bài qua chuỗi provider, thứ tự theo sức khỏe hiện tại (dpaste ưu tiên khi ngang điểm).
+    Provider lỗi liên tục bị ngắt (circuit breaker) và chỉ được thử lại sau cooldown.
+    """
+    # Validate content
+    if not validate_content(content):
+        return {"error": "Content không hợp lệ hoặc quá ngắn"}
+    
+    # Chỉ gửi tới các provider nhận được kích thước này, không upload thử rồi bị từ chối
+    chain = chain or PROVIDER_CHAIN
+    accepted = [(name, fn) for name, fn in chain if fits(name, content)]
+    if not accepted:
+        size = content_size(content, "bytes")
+        logger.warning(f"Content {size} byte vượt giới hạn của mọi provider")
+        return {"error": f"Content quá lớn ({size} byte) cho mọi provider", "tried": []}
+    if len(accepted) < len(chain):
+        logger.info(f"Bỏ qua {len(chain) - len(accepted)} provider không nhận được {len(content)} ký tự")
+
+    logger.info(f"Đang đăng bài với {len(content)} ký tự")
+    return router.call_chain(content, accepted)
+
+def post_markdown(content: str) -> Dict[str, Any]:
+    """
+    Đăng nội dung Markdown (bài gộp): thử các provider hiển thị Markdown trước,
+    chỉ khi tất cả đều lỗi mới sang provider văn bản thuần
+    """
+    markdown = [(name, fn) for name, fn in PROVIDER_CHAIN if name in MARKDOWN_PROVIDERS]
+    result = post_rentry(content, markdown)
+    if "url" in result or result.get("budget_exceeded"):
+        return result
+    fallback = post_rentry(content, [(name, fn) for name, fn in PROVIDER_CHAIN if name not in MARKDOWN_PROVIDERS])
+    fallback["tried"] = result.get("tried", []) + fallback.get("tried", [])
+    if "url" not in fallback:
+        fallback["error"] = f"{result.get('error')} | {fallback.get('error')}"
+    return fallback
@@ -1,16 +1,38 @@
 import streamlit as st
 import pandas as pd
-import requests
 import io
+import os
 import time
+from functools import partial
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
 import logging
-import re
-from typing import Dict, Any, Optional
+
+from routing import router, DEFAULT_FAILURE_THRESHOLD, DEFAULT_COOLDOWN
+from engine import rate_limiter, DEFAULT_RATE_LIMITS
+from validation import ColumnValidation
+from stages import prepare_column
+from journal import Journal, file_hash
+from ingest import SUPPORTED_TYPES, MissingContentColumn, load_content_frame
+from cache import ResultCache, DEFAULT_TTL, DEFAULT_MAX_ENTRIES
+from pipeline import InputFile, JobSettings, run_batch_job, unique_names, format_duration
+from export import EXPORT_FORMATS, EXPORT_MIME, export_path, read_export
+from jobs import Job, job_manager, QUEUED as JOB_QUEUED, DONE as JOB_DONE, CANCELLED as JOB_CANCELLED
+from providers import SIZE_LIMITS, GZIP_MIN_BYTES
+from deadline import DEFAULT_ROW_BUDGET
+from verify import DEFAULT_VERIFY_CONCURRENCY
+from bundle import DEFAULT_BUNDLE_ROWS, DEFAULT_BUNDLE_BYTES
+from http_pool import http_pool, DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 
 # Cấu hình logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Số dòng kết quả hiển thị trên trang (file tải về có đủ mọi dòng)
+PREVIEW_ROWS = 200
+# Chu kỳ vẽ lại bảng tiến độ khi job đang chạy (giây)
+UI_REFRESH_SECONDS = 1.0
+
 st.set_page_config(
     page_title="Rentry Bulk Poster", 
     page_icon="🐷", 
@@ -38,7 +60,8 @@ with st.sidebar:
     st.write("- Headers, Lists → Clean text")
     
     st.header("⚠️ Lưu ý")
-    st.write("- Mỗi bài đăng cách nhau 3 giây")
+    st.write("- Đăng song song, giới hạn tốc độ riêng cho từng provider")
+    st.write("- Tôn trọng header `Retry-After` khi bị 429/503")
     st.write("- **API** → **Session** → **Form** (3 phương thức)")
     st.write("- Tự động retry khi gặp lỗi 403/500")
     st.write("- Kiểm tra kết quả trước khi tải file")
@@ -50,14 +73,85 @@ with st.sidebar:
     st.write("4. **Form Mode**: 3 phương thức khác nhau")
     st.write("5. **Selenium Mode**: Giả lập trình duyệt thật")
     st.write("6. **Alternative**: 0x0.st, pastebin.com")
+    st.write("➡️ Thứ tự tự động theo tình trạng từng provider, provider lỗi liên tục bị tạm ngắt (circuit breaker)")
     
     st.header("⚠️ Yêu cầu hệ thống")
     st.write("- **Chrome/Chromium** cho Selenium")
     st.write("- **ChromeDriver** tự động tải")
     st.write("- **Internet** ổn định")
 
-uploaded_file = st.file_uploader("📂 Chọn file Excel (.xlsx)", type=["xlsx"])
-delay = st.number_input("⏱ Giãn cách giữa các bài (giây)", min_value=0.0, value=3.0, step=0.5)
+    st.header("🔬 Profiling")
+    profile_run = st.checkbox(
+        "Profile lần đăng tiếp theo", value=False,
+        help="cProfile + collapsed stack mọi thread (flamegraph) + snapshot tracemalloc ở đỉnh bộ nhớ. Chạy chậm hơn"
+    )
+
+uploaded_files = st.file_uploader(
+    "📂 Chọn một hoặc nhiều file Excel (.xlsx), CSV hoặc Parquet", type=SUPPORTED_TYPES, accept_multiple_files=True
+) or []
+# Một file: xem trước và kiểm tra chi tiết; nhiều file: bảng tổng hợp, mọi file đăng chung một job
+uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+concurrency = st.number_input("⚡ Số bài đăng song song", min_value=1, max_value=32, value=4, step=1)
+
+# Rate limit, circuit breaker và connection pool dùng chung cho mọi job của process:
+# chỉ được áp dụng khi bắt đầu một job lúc không còn job nào khác (xem apply_shared_settings)
+SHARED_SETTINGS_NOTE = "Dùng chung cho mọi phiên, chỉ được áp dụng khi bắt đầu đăng lúc không còn job nào đang chạy"
+
+with st.expander("⏱ Giới hạn tốc độ theo provider"):
+    st.caption(SHARED_SETTINGS_NOTE)
+    rate_limits = {}
+    for provider, (default_rate, default_burst) in DEFAULT_RATE_LIMITS.items():
+        rate = st.number_input(
+            f"{provider} (request/giây)", min_value=0.0, value=float(default_rate), step=0.1,
+            key=f"rate_{provider}", help="0 = không giới hạn"
+        )
+        rate_limits[provider] = (rate, default_burst)
+
+with st.expander("🔌 Kết nối HTTP"):
+    pool_size = st.number_input("Số kết nối tối đa mỗi host", min_value=1, max_value=100, value=DEFAULT_POOL_SIZE, step=1,
+                                help=SHARED_SETTINGS_NOTE)
+    connect_timeout = st.number_input("Connect timeout (giây)", min_value=1.0, value=DEFAULT_CONNECT_TIMEOUT, step=1.0)
+    read_timeout = st.number_input("Read timeout (giây)", min_value=1.0, value=DEFAULT_READ_TIMEOUT, step=5.0)
+    row_budget = st.number_input(
+        "Thời gian tối đa cho mỗi dòng (giây)", min_value=0.0, value=DEFAULT_ROW_BUDGET, step=10.0,
+        help="Gồm mọi provider, retry và chờ rate limit; timeout được rút ngắn theo thời gian còn lại. 0 = không giới hạn"
+    )
+
+with st.expander("🩺 Circuit breaker"):
+    st.caption(SHARED_SETTINGS_NOTE)
+    failure_threshold = st.number_input("Số lỗi liên tiếp để ngắt provider", min_value=1, value=DEFAULT_FAILURE_THRESHOLD, step=1)
+    cooldown = st.number_input("Thời gian chờ trước khi thử lại (giây)", min_value=1.0, value=DEFAULT_COOLDOWN, step=10.0)
+
+with st.expander("♻️ Cache nội dung trùng lặp"):
+    use_cache = st.checkbox("Dùng lại URL cho content đã đăng", value=True, help="Content giống hệt nhau chỉ đăng một lần")
+    cache_ttl_hours = st.number_input("Thời hạn cache (giờ)", min_value=0.0, value=DEFAULT_TTL / 3600, step=1.0)
+    cache_max_entries = st.number_input("Số bản ghi tối đa", min_value=100, value=DEFAULT_MAX_ENTRIES, step=1000)
+
+with st.expander("📦 Kích thước nội dung"):
+    st.caption("Dòng vượt giới hạn của một provider không được gửi tới provider đó; vượt mọi giới hạn thì báo lỗi ngay")
+    st.dataframe(pd.DataFrame(
+        [{"provider": name, "giới hạn": limit, "đơn vị": unit} for name, (limit, unit) in SIZE_LIMITS.items()]
+    ))
+    gzip_min_kb = st.number_input(
+        "Nén gzip khi upload 0x0.st từ (KB)", min_value=0, value=GZIP_MIN_BYTES // 1024, step=64,
+        help="0 = tắt. Link 0x0.st khi đó trỏ tới file .gz thay vì văn bản thuần"
+    )
+
+with st.expander("🧺 Gộp nhiều dòng vào một bài"):
+    st.caption("Mỗi dòng là một heading `## row-<số dòng>` trong bài gộp, bài gộp ưu tiên đăng lên rentry (Markdown)"
+               " và link của dòng là `<link bài>#row-<số dòng>`; nếu phải đăng lên provider văn bản thuần"
+               " thì link của dòng là link bài gộp")
+    bundle_rows = st.number_input("Số dòng tối đa mỗi bài (0 = không gộp)", min_value=0, max_value=1000,
+                                  value=DEFAULT_BUNDLE_ROWS, step=10)
+    bundle_kb = st.number_input("Kích thước tối đa mỗi bài (KB)", min_value=1, value=DEFAULT_BUNDLE_BYTES // 1000, step=10)
+
+with st.expander("🔎 Kiểm tra link sau khi đăng"):
+    verify_links = st.checkbox(
+        "Tải lại từng link và so với nội dung đã đăng", value=False,
+        help="Link không chứa đúng nội dung (hoặc 404) được đăng lại một lần; thêm cột verified / verify_ms"
+    )
+    verify_concurrency = st.number_input("Số link kiểm tra song song", min_value=1, max_value=64,
+                                         value=DEFAULT_VERIFY_CONCURRENCY, step=1)
 
 # Tùy chọn chuyển đổi Markdown
 col1, col2 = st.columns(2)
@@ -66,358 +160,113 @@ with col1:
 with col2:
     show_preview = st.checkbox("👁️ Xem trước chuyển đổi", value=False, help="Hiển thị nội dung sau khi chuyển đổi")
 
-# Headers giả lập trình duyệt
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                  "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-    "Accept": "application/json, text/plain, */*",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Origin": "https://rentry.co",
-    "Referer": "https://rentry.co/",
-    "Connection": "keep-alive"
-}
-
-def convert_markdown_to_plain_text(markdown_text: str) -> str:
-    """
-    Chuyển đổi Markdown thành văn bản thuần với hyperlink
-    """
-    if not markdown_text:
-        return markdown_text
-    
-    text = markdown_text
-    
-    # Chuyển đổi các link markdown [text](url) thành text (url)
-    link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-    text = re.sub(link_pattern, r'\1 (\2)', text)
-    
-    # Chuyển đổi các link trực tiếp thành text (url)
-    url_pattern = r'(https?://[^\s]+)'
-    text = re.sub(url_pattern, r'(\1)', text)
-    
-    # Loại bỏ các markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Bold **text**
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Italic *text*
-    text = re.sub(r'`(.*?)`', r'\1', text)        # Code `text`
-    text = re.sub(r'#{1,6}\s*', '', text)         # Headers # ## ###
-    text = re.sub(r'^\s*[-*+]\s*', '', text, flags=re.MULTILINE)  # List items
-    text = re.sub(r'^\s*\d+\.\s*', '', text, flags=re.MULTILINE)  # Numbered lists
-    
-    # Loại bỏ các dòng trống thừa
-    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
-    
-    return text.strip()
+def render_progress(panel, done: int, total: int, processed: int, elapsed: float) -> None:
+    """Bảng tiến độ: số dòng, tốc độ, thời gian đã chạy và ước tính còn lại"""
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else None
+    with panel.container():
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("📈 Tiến độ", f"{done}/{total}")
+        col2.metric("⚡ Tốc độ", f"{rate:.2f} dòng/s")
+        col3.metric("⏱ Đã chạy", format_duration(elapsed))
+        col4.metric("⏳ Còn lại", format_duration(eta))
 
-def validate_content(content: str) -> bool:
-    """Kiểm tra content có hợp lệ không"""
-    if not content or content.strip() == "":
-        return False
-    # Giảm yêu cầu độ dài tối thiểu từ 10 xuống 3 ký tự
-    if len(content.strip()) < 3:
-        return False
-    if content.lower() in ["nan", "null", "none", "undefined"]:
-        return False
-    return True
-
-def post_rentry_with_session(content: str) -> Dict[str, Any]:
+@st.cache_data(max_entries=4, show_spinner="Đang đọc file...")
+def load_upload(fhash: str, name: str, _data: bytes) -> pd.DataFrame:
     """
-    Thử đăng bài với session để duy trì cookies
+    Đọc cột content của file upload, cache theo hash để các lần rerun không phải parse lại
     """
-    logger.info("Thử với session mode")
-    try:
-        session = requests.Session()
-        session.headers.update(HEADERS)
-        
-        # Lấy trang chủ trước để có cookies
-        session.get("https://rentry.co", timeout=30)
-        
-        # Thử API với session
-        r = session.post("https://rentry.co/api/new", data={"text": content}, timeout=30)
-        logger.info(f"Session API: Status {r.status_code}")
-        
-        if r.status_code == 200:
-            try:
-                result = r.json()
-                logger.info("Session API thành công")
-                return result
-            except Exception:
-                pass
-        
-        # Thử form với session
-        r = session.post("https://rentry.co", data={"text": content}, timeout=30)
-        logger.info(f"Session Form: Status {r.status_code}, URL: {r.url}")
-        
-        if r.status_code == 200 and "rentry.co/" in r.url:
-            return {"url": r.url, "edit_code": "Session mode", "method": "session"}
-        
-        return {"error": f"Session mode fail: {r.status_code}"}
-        
-    except Exception as e:
-        logger.error(f"Session Exception: {e}")
-        return {"error": f"Session Exception: {e}"}
+    return load_content_frame(io.BytesIO(_data), name)
 
-def post_rentry(content: str, max_retries: int = 2) -> Dict[str, Any]:
+@st.cache_data(max_entries=64, show_spinner="Đang chuyển đổi và kiểm tra nội dung...")
+def prepare_upload(fhash: str, name: str, convert: bool, _data: bytes) -> ColumnValidation:
     """
-    Đăng bài lên dpaste.com trước, nếu fail thì thử rentry
+    Cột content đã chuyển đổi + kiểm tra, cache theo (hash file, tùy chọn chuyển đổi):
+    bật / tắt checkbox không đọc lại file, và kết quả được lưu Parquet trên đĩa cho các phiên sau
     """
-    # Validate content
-    if not validate_content(content):
-        return {"error": "Content không hợp lệ hoặc quá ngắn"}
-    
-    logger.info(f"Đang đăng bài với {len(content)} ký tự")
+    return prepare_column(load_upload(fhash, name, _data)["content"], fhash, convert)
 
-    # --- Thử dpaste trước (ưu tiên cao nhất) ---
-    dpaste_result = post_dpaste(content)
-    if "url" in dpaste_result:
-        return dpaste_result
-    
-    # --- Nếu dpaste fail, thử rentry API ---
-    data = {"text": content.strip()}
-    for attempt in range(max_retries):
-        try:
-            r = requests.post("https://rentry.co/api/new", data=data, headers=HEADERS, timeout=30)
-            logger.info(f"Rentry API attempt {attempt + 1}: Status {r.status_code}")
-            
-            if r.status_code == 200:
-                try:
-                    result = r.json()
-                    logger.info("Rentry API thành công")
-                    return result
-                except Exception as e:
-                    logger.warning(f"Rentry API trả về không phải JSON: {e}")
-                    if attempt == max_retries - 1:
-                        # Thử session mode
-                        session_result = post_rentry_with_session(content)
-                        if "url" in session_result:
-                            return session_result
-                        # Thử alternative services
-                        return post_rentry_alternative(content)
-            else:
-                logger.warning(f"Rentry API failed với status {r.status_code}")
-                if attempt == max_retries - 1:
-                    # Thử session mode
-                    session_result = post_rentry_with_session(content)
-                    if "url" in session_result:
-                        return session_result
-                    # Thử form mode
-                    form_result = post_rentry_form(content)
-                    if "url" in form_result:
-                        return form_result
-                    # Thử selenium mode
-                    selenium_result = post_rentry_selenium(content)
-                    if "url" in selenium_result:
-                        return selenium_result
-                    # Thử alternative services
-                    return post_rentry_alternative(content)
-                    
-        except Exception as e:
-            logger.error(f"Rentry API Exception attempt {attempt + 1}: {e}")
-            if attempt == max_retries - 1:
-                # Thử session mode
-                session_result = post_rentry_with_session(content)
-                if "url" in session_result:
-                    return session_result
-                # Thử form mode
-                form_result = post_rentry_form(content)
-                if "url" in form_result:
-                    return form_result
-                # Thử selenium mode
-                selenium_result = post_rentry_selenium(content)
-                if "url" in selenium_result:
-                    return selenium_result
-                # Thử alternative services
-                return post_rentry_alternative(content)
-        
-        # Delay trước khi retry
-        if attempt < max_retries - 1:
-            time.sleep(2)
-    
-    return {"error": "Tất cả attempts đều fail"}
+@st.cache_resource
+def get_journal() -> Journal:
+    return Journal()
 
-def post_rentry_form(content: str) -> Dict[str, Any]:
-    """
-    Fallback: giả lập submit form web với nhiều phương thức
-    """
-    logger.info("Chuyển sang form mode")
-    
-    # Thử nhiều phương thức khác nhau
-    methods = [
-        {"url": "https://rentry.co", "data": {"text": content}},
-        {"url": "https://rentry.co/", "data": {"text": content}},
-        {"url": "https://rentry.co/new", "data": {"text": content}},
-    ]
-    
-    for i, method in enumerate(methods):
-        try:
-            logger.info(f"Form method {i+1}: {method['url']}")
-            
-            # Headers khác nhau cho từng phương thức
-            headers = HEADERS.copy()
-            if i == 1:
-                headers["Content-Type"] = "application/x-www-form-urlencoded"
-            elif i == 2:
-                headers["X-Requested-With"] = "XMLHttpRequest"
-            
-            r = requests.post(method["url"], data=method["data"], headers=headers, timeout=30)
-            logger.info(f"Form method {i+1}: Status {r.status_code}, URL: {r.url}")
-            
-            if r.status_code == 200:
-                # Kiểm tra response có chứa link rentry không
-                if "rentry.co/" in r.url or "rentry.co/" in r.text:
-                    # Tìm link trong response
-                    import re
-                    link_match = re.search(r'https://rentry\.co/[a-zA-Z0-9]+', r.text)
-                    if link_match:
-                        return {
-                            "url": link_match.group(), 
-                            "edit_code": "Chỉ có khi dùng API", 
-                            "method": f"form_{i+1}"
-                        }
-                    elif "rentry.co/" in r.url:
-                        return {
-                            "url": r.url, 
-                            "edit_code": "Chỉ có khi dùng API", 
-                            "method": f"form_{i+1}"
-                        }
-            
-            # Nếu không thành công, thử phương thức tiếp theo
-            if i < len(methods) - 1:
-                time.sleep(1)  # Delay giữa các attempts
-                
-        except Exception as e:
-            logger.error(f"Form method {i+1} Exception: {e}")
-            if i == len(methods) - 1:  # Lần cuối cùng
-                return {"error": f"Tất cả form methods đều fail: {e}"}
-    
-    return {"error": f"Form mode fail: 403 - Tất cả phương thức đều bị từ chối"}
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache()
 
-def post_rentry_selenium(content: str) -> Dict[str, Any]:
-    """
-    Phương thức Selenium: Giả lập trình duyệt thật
-    """
-    logger.info("Thử với Selenium mode")
-    try:
-        from selenium import webdriver
-        from selenium.webdriver.common.by import By
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
-        from selenium.webdriver.chrome.options import Options
-        from selenium.common.exceptions import TimeoutException, WebDriverException
-        
-        # Cấu hình Chrome headless
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
-        
-        driver = None
-        try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.get("https://rentry.co")
-            
-            # Tìm textarea và nhập content
-            wait = WebDriverWait(driver, 10)
-            textarea = wait.until(EC.presence_of_element_located((By.NAME, "text")))
-            textarea.clear()
-            textarea.send_keys(content)
-            
-            # Tìm và click submit button
-            submit_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
-            submit_button.click()
-            
-            # Chờ redirect và lấy URL
-            wait.until(lambda driver: "rentry.co/" in driver.current_url)
-            result_url = driver.current_url
-            
-            logger.info(f"Selenium thành công: {result_url}")
-            return {"url": result_url, "edit_code": "Selenium mode", "method": "selenium"}
-            
-        except TimeoutException:
-            logger.error("Selenium timeout - không tìm thấy element")
-            return {"error": "Selenium timeout"}
-        except WebDriverException as e:
-            logger.error(f"Selenium WebDriver error: {e}")
-            return {"error": f"Selenium WebDriver error: {e}"}
-        finally:
-            if driver:
-                driver.quit()
-                
-    except ImportError:
-        logger.warning("Selenium không được cài đặt")
-        return {"error": "Selenium không khả dụng - cần cài đặt selenium"}
-    except Exception as e:
-        logger.error(f"Selenium Exception: {e}")
-        return {"error": f"Selenium Exception: {e}"}
+def job_files(meta: Dict[str, Any]) -> List[Tuple[Optional[str], str]]:
+    """(tên file, hash file) các file của một job; job một file không có tên"""
+    return meta.get("files") or [(None, meta.get("fhash"))]
 
-def post_dpaste(content: str) -> Dict[str, Any]:
+def apply_shared_settings() -> bool:
     """
-    Đăng bài lên dpaste.com - phương thức chính
+    Áp rate limit, circuit breaker và kích thước connection pool của phiên này cho cả process.
+    Có job khác đang chạy / chờ thì giữ nguyên: đổi pool size đóng mọi session keep-alive
+    (kể cả session rentry đã có cookie) giữa lúc job đó đang đăng.
     """
-    logger.info("Đăng bài lên dpaste.com")
-    try:
-        data = {"content": content, "syntax": "text"}
-        r = requests.post("https://dpaste.com/api/v2/", data=data, timeout=30)
-        logger.info(f"Dpaste API: Status {r.status_code}")
-        
-        if r.status_code == 201:
-            result_url = r.text.strip()
-            logger.info(f"Dpaste thành công: {result_url}")
-            return {"url": result_url, "edit_code": "Dpaste API", "method": "dpaste"}
-        else:
-            return {"error": f"Dpaste API failed: {r.status_code}", "raw": r.text[:200]}
-            
-    except Exception as e:
-        logger.error(f"Dpaste Exception: {e}")
-        return {"error": f"Dpaste Exception: {e}"}
+    if job_manager.busy():
+        logger.info("Đang có job chạy, giữ nguyên rate limit / circuit breaker / connection pool")
+        return False
+    for provider, (rate, burst) in rate_limits.items():
+        rate_limiter.configure(provider, rate, burst)
+    router.configure(failure_threshold=failure_threshold, cooldown=cooldown)
+    http_pool.configure(pool_size=max(pool_size, concurrency))
+    return True
 
-def post_rentry_alternative(content: str) -> Dict[str, Any]:
-    """
-    Phương thức thay thế: Thử các service paste khác
-    """
-    logger.info("Thử phương thức thay thế")
-    
-    # Thử 0x0.st
-    try:
-        files = {"file": content.encode()}
-        r = requests.post("https://0x0.st", files=files, timeout=30)
-        if r.status_code == 200:
-            result_url = r.text.strip()
-            logger.info(f"0x0.st thành công: {result_url}")
-            return {"url": result_url, "edit_code": "0x0.st mode", "method": "0x0.st"}
-    except Exception as e:
-        logger.warning(f"0x0.st failed: {e}")
-    
-    # Thử pastebin.com
-    try:
-        data = {"api_dev_key": "anonymous", "api_option": "paste", "api_paste_code": content}
-        r = requests.post("https://pastebin.com/api/api_post.php", data=data, timeout=30)
-        if r.status_code == 200 and "http" in r.text:
-            result_url = r.text.strip()
-            logger.info(f"Pastebin thành công: {result_url}")
-            return {"url": result_url, "edit_code": "Pastebin mode", "method": "pastebin"}
-    except Exception as e:
-        logger.warning(f"Pastebin failed: {e}")
-    
-    return {"error": "Tất cả phương thức thay thế đều fail"}
+def start_job(title: str, files: List[InputFile], meta: Dict[str, Any], output_format: str) -> None:
+    """Đưa các file vào một job nền (không bị ngắt khi trang rerun / đóng tab) rồi theo dõi job đó"""
+    apply_shared_settings()
+    result_cache = None
+    if use_cache:
+        result_cache = get_result_cache()
+        result_cache.configure(ttl=cache_ttl_hours * 3600, max_entries=cache_max_entries)
+
+    name = f"rentry_results_{int(time.time())}_{files[0].fhash[:8]}"
+    job = job_manager.submit(
+        title, sum(len(f.rows) for f in files), run_batch_job,
+        meta=meta,
+        files=files, concurrency=concurrency, journal=get_journal(), cache=result_cache,
+        output=export_path(name, output_format), fmt=output_format,
+        profile=export_path(f"{name}_profile", "zip") if profile_run else None,
+        verify_concurrency=verify_concurrency if verify_links else 0,
+        # Chụp cấu hình lúc bấm nút: phiên khác đổi cấu hình không ảnh hưởng job này
+        settings=JobSettings(row_budget=row_budget, gzip_min_bytes=gzip_min_kb * 1024,
+                             connect_timeout=connect_timeout, read_timeout=read_timeout,
+                             bundle_rows=bundle_rows, bundle_bytes=bundle_kb * 1000),
+    )
+    st.session_state["job_id"] = job.id
+    st.query_params["job"] = job.id
+    st.rerun()
+
+def pending_rows(validation: ColumnValidation, finished: set) -> List[Tuple[int, str, bool]]:
+    pending = [idx for idx in range(len(validation.content)) if idx not in finished]
+    return list(zip(
+        pending,
+        validation.content.iloc[pending].tolist(),
+        validation.valid.iloc[pending].tolist(),
+    ))
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
-        logger.info(f"Đã load file Excel với {len(df)} dòng")
+        fhash = file_hash(uploaded_file.getvalue())
+        try:
+            df = load_upload(fhash, uploaded_file.name, uploaded_file.getvalue())
+            logger.info(f"Đã load file {uploaded_file.name} với {len(df)} dòng")
+        except MissingContentColumn as e:
+            df = None
+            st.error("❌ File phải có cột tên là `content`.")
+            st.write("**Các cột có sẵn:**", e.columns)
 
-        if "content" not in df.columns:
-            st.error("❌ File Excel phải có cột tên là `content`.")
-            st.write("**Các cột có sẵn:**", list(df.columns))
-        else:
+        if df is not None:
             st.write("📋 Xem trước dữ liệu:")
             st.dataframe(df.head())
             
-            # Thống kê dữ liệu
+            # Cột content đã chuyển đổi + kiểm tra, tính một lần cho mỗi file + tùy chọn,
+            # dùng chung cho thống kê, bảng lỗi, preview và vòng đăng bài
             total_rows = len(df)
-            valid_content = df["content"].apply(lambda x: validate_content(str(x))).sum()
-            invalid_content = total_rows - valid_content
+            validation = prepare_upload(fhash, uploaded_file.name, convert_markdown, uploaded_file.getvalue())
+            valid_content = validation.valid_count
+            invalid_content = validation.invalid_count
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -430,26 +279,14 @@ if uploaded_file:
             # Hiển thị các dòng không hợp lệ để debug
             if invalid_content > 0:
                 st.warning(f"⚠️ Có {invalid_content} dòng không hợp lệ:")
-                invalid_rows = []
-                for idx, row in df.iterrows():
-                    content = str(row["content"]).strip()
-                    if not validate_content(content):
-                        invalid_rows.append({
-                            "Dòng": idx + 1,
-                            "Content": content[:100] + "..." if len(content) > 100 else content,
-                            "Độ dài": len(content)
-                        })
-                
-                if invalid_rows:
-                    st.dataframe(pd.DataFrame(invalid_rows))
+                st.dataframe(validation.invalid_table())
             
             # Hiển thị preview chuyển đổi Markdown nếu được chọn
             if show_preview and convert_markdown:
                 st.subheader("👁️ Xem trước chuyển đổi Markdown")
                 preview_rows = []
-                for idx, row in df.head(3).iterrows():  # Chỉ hiển thị 3 dòng đầu
-                    original = str(row["content"]).strip()
-                    converted = convert_markdown_to_plain_text(original)
+                originals = df["content"].head(3).fillna("").astype(str).str.strip().tolist()  # Chỉ hiển thị 3 dòng đầu
+                for idx, (original, converted) in enumerate(zip(originals, validation.content.head(3))):
                     preview_rows.append({
                         "Dòng": idx + 1,
                         "Markdown gốc": original[:100] + "..." if len(original) > 100 else original,
@@ -460,100 +297,225 @@ if uploaded_file:
                     st.dataframe(pd.DataFrame(preview_rows))
                     st.info("💡 Chỉ hiển thị 3 dòng đầu tiên để preview")
 
-            if st.button("🚀 Bắt đầu đăng", type="primary"):
-                # Progress bar
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                results = []
-                success_count = 0
-                error_count = 0
-
-                for idx, row in df.iterrows():
-                    content = str(row["content"]).strip()
-                    
-                    # Chuyển đổi Markdown nếu được chọn
-                    if convert_markdown:
-                        content = convert_markdown_to_plain_text(content)
-                    
-                    # Update progress
-                    progress = (idx + 1) / total_rows
-                    progress_bar.progress(progress)
-                    status_text.text(f"Đang xử lý dòng {idx + 1}/{total_rows}...")
-                    
-                    if not validate_content(content):
-                        # Debug info cho content không hợp lệ
-                        debug_info = f"Content: '{content[:50]}...' (Length: {len(content)})"
-                        results.append({
-                            "row": idx+1, 
-                            "status": "❌ Content không hợp lệ", 
-                            "url": None, 
-                            "edit_code": None,
-                            "error": f"Content quá ngắn hoặc trống - {debug_info}"
-                        })
-                        error_count += 1
-                        logger.warning(f"Dòng {idx + 1} content không hợp lệ: {debug_info}")
-                        continue
-
-                    logger.info(f"Đang xử lý dòng {idx + 1}")
-                    res = post_rentry(content)
-
-                    if "url" in res:
-                        results.append({
-                            "row": idx+1,
-                            "status": "✅ Thành công",
-                            "url": res["url"],
-                            "edit_code": res.get("edit_code", "N/A"),
-                            "method": res.get("method", "API")
-                        })
-                        success_count += 1
-                        logger.info(f"Dòng {idx + 1} thành công: {res['url']}")
-                    else:
-                        results.append({
-                            "row": idx+1,
-                            "status": f"❌ Lỗi",
-                            "url": None,
-                            "edit_code": None,
-                            "error": str(res.get("error", "Unknown error"))
-                        })
-                        error_count += 1
-                        logger.error(f"Dòng {idx + 1} lỗi: {res}")
-
-                    # Giãn cách
-                    if delay > 0 and idx < len(df) - 1:
-                        time.sleep(delay)
-
-                # Hoàn thành
-                progress_bar.progress(1.0)
-                status_text.text("Hoàn tất!")
-                
-                result_df = pd.DataFrame(results)
-                
-                # Hiển thị kết quả
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("✅ Thành công", success_count)
-                with col2:
-                    st.metric("❌ Lỗi", error_count)
-                with col3:
-                    st.metric("📊 Tổng", total_rows)
-                
-                st.success("🎉 Hoàn tất đăng bài!")
-                st.dataframe(result_df)
-
-                # Xuất Excel kết quả
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                    result_df.to_excel(writer, index=False, sheet_name="Results")
-                output.seek(0)
-
-                st.download_button(
-                    label="📥 Tải file kết quả",
-                    data=output,
-                    file_name=f"rentry_results_{int(time.time())}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            # Journal: resume từ các dòng chưa xong của cùng file
+            journal = get_journal()
+            retry_failed = st.checkbox("🔁 Đăng lại các dòng lỗi trong journal", value=False)
+            finished = journal.finished_rows(fhash, include_failed=not retry_failed)
+            if finished:
+                st.info(f"📒 Journal đã có kết quả cho {len(finished)}/{total_rows} dòng của file này - sẽ tiếp tục từ các dòng còn lại")
+                if st.button("🗑️ Xóa journal và đăng lại từ đầu"):
+                    journal.clear(fhash)
+                    st.rerun()
+
+            active = job_manager.get(st.session_state.get("job_id"))
+            busy = active is not None and not active.finished and fhash in dict(job_files(active.meta)).values()
+            if busy:
+                st.info(f"⏳ File này đang được đăng trong job {active.id}")
+
+            output_format = st.selectbox("📄 Định dạng file kết quả", EXPORT_FORMATS,
+                                         help="CSV / Parquet chỉ có bảng Results")
+
+            if st.button("🚀 Bắt đầu đăng", type="primary", disabled=busy):
+                start_job(
+                    uploaded_file.name, [InputFile(None, fhash, pending_rows(validation, finished), finished)],
+                    {"fhash": fhash, "total_rows": total_rows, "skipped": len(finished)}, output_format,
                 )
-                
+
     except Exception as e:
-        st.error(f"❌ Lỗi khi đọc file Excel: {e}")
+        st.error(f"❌ Lỗi khi đọc file: {e}")
         logger.error(f"File read error: {e}")
+
+elif uploaded_files:
+    # Nhiều file: kiểm tra từng file (cache như một file), đăng tất cả trên cùng một pipeline
+    journal = get_journal()
+    retry_failed = st.checkbox("🔁 Đăng lại các dòng lỗi trong journal", value=False)
+    ready = []  # (tên, hash, validation, các dòng đã có trong journal)
+    overview = []
+    for upload, name in zip(uploaded_files, unique_names([u.name for u in uploaded_files])):
+        data = upload.getvalue()
+        fhash = file_hash(data)
+        row = {"file": name, "dòng": 0, "hợp lệ": 0, "không hợp lệ": 0, "đã có trong journal": 0, "ghi chú": ""}
+        overview.append(row)
+        if any(fhash == other for _, other, _, _ in ready):
+            row["ghi chú"] = "Trùng nội dung với file khác, bỏ qua"
+            continue
+        try:
+            validation = prepare_upload(fhash, upload.name, convert_markdown, data)
+        except MissingContentColumn as e:
+            row["ghi chú"] = f"Không có cột content (có: {e.columns}), bỏ qua"
+            continue
+        except Exception as e:
+            logger.error(f"File read error {upload.name}: {e}")
+            row["ghi chú"] = f"Lỗi khi đọc file: {e}"
+            continue
+        finished = journal.finished_rows(fhash, include_failed=not retry_failed)
+        ready.append((name, fhash, validation, finished))
+        row.update({"dòng": len(validation.content), "hợp lệ": validation.valid_count,
+                    "không hợp lệ": validation.invalid_count, "đã có trong journal": len(finished)})
+
+    overview = pd.DataFrame(overview)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📂 File", f"{len(ready)}/{len(uploaded_files)}")
+    col2.metric("📊 Tổng dòng", int(overview["dòng"].sum()))
+    col3.metric("✅ Hợp lệ", int(overview["hợp lệ"].sum()))
+    col4.metric("❌ Không hợp lệ", int(overview["không hợp lệ"].sum()))
+    st.dataframe(overview)
+
+    active = job_manager.get(st.session_state.get("job_id"))
+    busy = active is not None and not active.finished and bool(
+        {fhash for _, fhash, _, _ in ready} & set(dict(job_files(active.meta)).values())
+    )
+    if busy:
+        st.info(f"⏳ Một số file đang được đăng trong job {active.id}")
+
+    output_format = st.selectbox("📄 Định dạng file kết quả", EXPORT_FORMATS,
+                                 help="Excel: mỗi file một sheet + sheet Summary; CSV / Parquet: một bảng có cột file")
+
+    if st.button(f"🚀 Đăng {len(ready)} file", type="primary", disabled=busy or not ready):
+        files = [InputFile(name, fhash, pending_rows(validation, finished), finished)
+                 for name, fhash, validation, finished in ready]
+        start_job(
+            f"{len(files)} file", files,
+            {"files": [(f.name, f.fhash) for f in files],
+             "total_rows": sum(len(validation.content) for _, _, validation, _ in ready),
+             "skipped": sum(len(f.skipped) for f in files)},
+            output_format,
+        )
+
+def render_results(job: Job) -> None:
+    """Kết quả của một job đã xong: số liệu từ file kết quả, bảng xem trước đọc từ journal"""
+    export = job.result or {}
+    summary = export.get("summary", {})
+    success_count = summary.get("success", 0)
+    error_count = summary.get("error", 0)
+
+    # Hiển thị kết quả
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("✅ Thành công", success_count)
+    with col2:
+        st.metric("❌ Lỗi", error_count)
+    with col3:
+        st.metric("📊 Tổng", job.meta["total_rows"])
+
+    if summary.get("verified") or summary.get("unverified"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("🔎 Link đúng nội dung", summary["verified"])
+        with col2:
+            st.metric("⚠️ Chưa xác minh", summary["unverified"])
+
+    cache_stats = export.get("cache")
+    if cache_stats:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("♻️ Cache hit", cache_stats["hits"])
+        with col2:
+            st.metric("📤 Cache miss", cache_stats["misses"])
+
+    if job.status == JOB_DONE:
+        st.success("🎉 Hoàn tất đăng bài!")
+    elif job.status == JOB_CANCELLED:
+        st.warning(f"⛔ Job đã bị hủy sau {job.done}/{job.total} dòng - bấm đăng lại để tiếp tục từ journal")
+    else:
+        st.error(f"❌ Job lỗi: {job.error}")
+
+    file_table = export.get("files")
+    if file_table is not None:
+        st.dataframe(file_table)
+
+    # Chỉ đọc vài dòng đầu từ journal để xem trước, file tải về có đủ mọi dòng
+    journal = get_journal()
+    results = (
+        {"file": name, **r} if name else r
+        for name, fhash in job_files(job.meta) for r in journal.iter_results(fhash)
+    )
+    preview = [{k: v for k, v in r.items() if k != "spans"} for r in islice(results, PREVIEW_ROWS)]
+    st.dataframe(pd.DataFrame(preview))
+    if summary.get("total", 0) > PREVIEW_ROWS:
+        st.info(f"💡 Chỉ hiển thị {PREVIEW_ROWS} dòng đầu, tải file kết quả để xem đủ {summary['total']} dòng")
+
+    providers = export.get("providers")
+    if providers is not None and not providers.empty:
+        with st.expander("⏱ Thời gian theo provider"):
+            st.dataframe(providers)
+
+    provider_health = router.snapshot()
+    if provider_health:
+        with st.expander("🩺 Tình trạng provider"):
+            st.dataframe(pd.DataFrame(provider_health))
+
+    pool_stats = http_pool.stats()
+    if pool_stats:
+        with st.expander("🔌 Thống kê kết nối"):
+            st.dataframe(pd.DataFrame.from_dict(pool_stats, orient="index"))
+
+    # File kết quả đã được ghi dần ra đĩa trong lúc đăng, chỉ đọc khi bấm tải
+    output = export.get("output")
+    if output and os.path.exists(output):
+        st.download_button(
+            label="📥 Tải file kết quả",
+            data=partial(read_export, output),
+            file_name=os.path.basename(output),
+            mime=EXPORT_MIME[export["format"]]
+        )
+
+    profile = export.get("profile")
+    if profile and os.path.exists(profile):
+        st.download_button(
+            label="🔬 Tải profile (pstats, flamegraph, tracemalloc)",
+            data=partial(read_export, profile),
+            file_name=os.path.basename(profile),
+            mime="application/zip"
+        )
+
+@st.fragment(run_every=UI_REFRESH_SECONDS)
+def job_progress(job_id: str) -> None:
+    """
+    Vẽ lại tiến độ job theo chu kỳ UI_REFRESH_SECONDS (không theo từng dòng),
+    kèm bảng các dòng vừa xong và các lỗi gần nhất; khi job xong thì rerun cả trang.
+    """
+    job = job_manager.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    skipped = job.meta.get("skipped", 0)
+    total_rows = job.meta.get("total_rows", job.total)
+    st.progress(job.progress)
+    st.text("Đang chờ đến lượt..." if job.status == JOB_QUEUED else "Đang đăng...")
+    render_progress(st.empty(), skipped + job.done, total_rows, job.done, job.elapsed)
+
+    col1, col2 = st.columns(2)
+    col1.metric("✅ Thành công", job.success)
+    col2.metric("❌ Lỗi", job.errors)
+
+    recent = job.recent()
+    if recent:
+        st.caption(f"🧾 {len(recent)} dòng vừa xong (mới nhất ở trên)")
+        st.dataframe(pd.DataFrame(recent[::-1]), height=250)
+    failures = job.failures()
+    if failures:
+        with st.expander(f"⚠️ {len(failures)} lỗi gần nhất", expanded=True):
+            st.dataframe(pd.DataFrame(failures[::-1]).reindex(columns=["row", "status", "error", "tried"]))
+
+# Job đang theo dõi: lấy từ session, hoặc từ ?job=<id> khi mở lại tab
+job = job_manager.get(st.session_state.get("job_id") or st.query_params.get("job"))
+if job is not None:
+    st.session_state["job_id"] = job.id
+    st.divider()
+    st.subheader(f"🧵 Job {job.id}: {job.name}")
+    if job.finished:
+        render_results(job)
+    else:
+        job_progress(job.id)
+        if st.button("⛔ Hủy job"):
+            job_manager.cancel(job.id)
+            st.rerun()
+    if st.button("✖️ Bỏ theo dõi job này"):
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+        st.rerun()
+
+all_jobs = job_manager.jobs()
+if all_jobs:
+    with st.expander(f"🗂 Các job nền ({len(all_jobs)})"):
+        st.dataframe(pd.DataFrame([j.snapshot() for j in all_jobs]))
@@ -0,0 +1,243 @@
+import time
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any, List, Callable, Tuple
+
+import telemetry
+import deadline
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái circuit breaker
+CLOSED = "closed"        # hoạt động bình thường
+OPEN = "open"            # tạm bỏ qua provider
+HALF_OPEN = "half_open"  # cho một request thử lại sau cooldown
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 60.0
+DEFAULT_WINDOW = 20
+# Mẫu cũ mất dần trọng số: sau mỗi HALF_LIFE giây chỉ còn một nửa, lỗi thoáng qua không hạ hạng provider mãi
+DEFAULT_HALF_LIFE = 120.0
+# Mẫu cũ hơn ngần ấy half-life bị bỏ hẳn, lỗi đã phai không còn kéo điểm xuống dưới provider chưa lỗi
+SAMPLE_MAX_HALF_LIVES = 5
+# Cứ EXPLORE_EVERY dòng thì một dòng được gửi thử tới provider xếp dưới để làm mới điểm của nó (0 = tắt)
+DEFAULT_EXPLORE_EVERY = 20
+
+ProviderFn = Callable[[str], Dict[str, Any]]
+
+
+class ProviderHealth:
+    """Tỷ lệ thành công / độ trễ gần đây và circuit breaker của một provider"""
+
+    def __init__(self, name: str, window: int = DEFAULT_WINDOW, half_life: float = DEFAULT_HALF_LIFE):
+        self.name = name
+        self.samples = deque(maxlen=window)  # (ok, latency, thời điểm)
+        self.half_life = half_life
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def _weighted(self) -> List[Tuple[bool, float, float]]:
+        """(ok, latency, trọng số) của từng mẫu, trọng số giảm một nửa sau mỗi half_life giây"""
+        if self.half_life <= 0:
+            return [(ok, latency, 1.0) for ok, latency, _ in self.samples]
+        now = time.monotonic()
+        max_age = SAMPLE_MAX_HALF_LIVES * self.half_life
+        return [(ok, latency, 0.5 ** ((now - at) / self.half_life))
+                for ok, latency, at in self.samples if now - at < max_age]
+
+    @property
+    def last_sample_at(self) -> float:
+        return self.samples[-1][2] if self.samples else 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # Prior lạc quan: provider chưa có mẫu (hoặc lỗi cũ đã phai) ngang điểm provider luôn thành công,
+        # khi đó thứ tự mặc định quyết định
+        weighted = self._weighted()
+        ok = sum(weight for success, _, weight in weighted if success)
+        return (ok + 1) / (sum(weight for _, _, weight in weighted) + 1)
+
+    @property
+    def avg_latency(self) -> float:
+        weighted = self._weighted()
+        total = sum(weight for _, _, weight in weighted)
+        if total <= 0:
+            return 0.0
+        return sum(latency * weight for _, latency, weight in weighted) / total
+
+    @property
+    def score(self) -> float:
+        """Điểm sức khỏe: tỷ lệ thành công, giảm dần theo độ trễ trung bình"""
+        return self.success_rate / (1.0 + self.avg_latency / 10.0)
+
+
+class Router:
+    """
+    Sắp xếp chuỗi fallback theo sức khỏe hiện tại của từng provider,
+    bỏ qua provider đang mở circuit và thử lại sau cooldown.
+    Số liệu cũ phai dần theo thời gian, thỉnh thoảng một dòng được gửi tới provider xếp dưới
+    để điểm của nó không đứng yên ở lần lỗi cuối cùng.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 cooldown: float = DEFAULT_COOLDOWN, window: int = DEFAULT_WINDOW,
+                 half_life: float = DEFAULT_HALF_LIFE, explore_every: int = DEFAULT_EXPLORE_EVERY):
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {}
+        self._calls = 0
+        self.failure_threshold = int(failure_threshold)
+        self.cooldown = float(cooldown)
+        self.window = int(window)
+        self.half_life = float(half_life)
+        self.explore_every = int(explore_every)
+
+    def configure(self, failure_threshold: int = None, cooldown: float = None) -> None:
+        with self._lock:
+            if failure_threshold is not None:
+                self.failure_threshold = int(failure_threshold)
+            if cooldown is not None:
+                self.cooldown = float(cooldown)
+
+    def reset(self) -> None:
+        """Xóa toàn bộ số liệu sức khỏe (dùng cho benchmark)"""
+        with self._lock:
+            self._health.clear()
+            self._calls = 0
+
+    def _get(self, name: str) -> ProviderHealth:
+        health = self._health.get(name)
+        if health is None:
+            health = self._health[name] = ProviderHealth(name, self.window, self.half_life)
+        return health
+
+    def _probe_due(self, health: ProviderHealth, now: float) -> bool:
+        """Circuit đang mở đã hết cooldown (hoặc đang half-open) và chưa có lượt thử nào"""
+        if health.probe_in_flight:
+            return False
+        return health.state == HALF_OPEN or (health.state == OPEN and now - health.opened_at >= self.cooldown)
+
+    def acquire(self, name: str) -> bool:
+        """Provider có được gọi lúc này không (chuyển open -> half_open khi hết cooldown)"""
+        with self._lock:
+            health = self._get(name)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and time.monotonic() - health.opened_at >= self.cooldown:
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN and not health.probe_in_flight:
+                health.probe_in_flight = True
+                logger.info(f"{name}: thử lại sau cooldown (half-open)")
+                return True
+            return False
+
+    def release(self, name: str) -> None:
+        """Lần gọi không cho biết gì về provider (dòng hết thời gian): chỉ trả lại lượt thử half-open"""
+        with self._lock:
+            self._get(name).probe_in_flight = False
+
+    def record(self, name: str, ok: bool, latency: float) -> None:
+        with self._lock:
+            health = self._get(name)
+            health.samples.append((ok, latency, time.monotonic()))
+            health.probe_in_flight = False
+            if ok:
+                if health.state != CLOSED:
+                    logger.info(f"{name}: hoạt động trở lại, đóng circuit")
+                health.state = CLOSED
+                health.consecutive_failures = 0
+                return
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    logger.warning(f"{name}: lỗi {health.consecutive_failures} lần liên tiếp, mở circuit {self.cooldown:.0f}s")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def order(self, names: List[str], explore: bool = False) -> List[str]:
+        """
+        Sắp xếp theo điểm sức khỏe giảm dần, giữ thứ tự mặc định khi bằng điểm.
+        Provider đã hết cooldown được đưa lên đầu để lượt thử half-open thật sự diễn ra
+        (nếu không, chuỗi dừng ở provider thành công đầu tiên và không bao giờ tới nó).
+        `explore`: đưa provider xếp dưới lâu chưa được gọi nhất lên trước để làm mới điểm.
+        """
+        with self._lock:
+            now = time.monotonic()
+            health = {name: self._get(name) for name in names}
+            ranked = sorted(names, key=lambda name: -health[name].score)
+            due = [name for name in ranked if self._probe_due(health[name], now)]
+            rest = [name for name in ranked if name not in due]
+            if explore:
+                # Chỉ provider đã từng được gọi: cần làm mới điểm cũ, không tự dưng gọi provider chưa dùng tới
+                stale = [name for name in rest[1:] if health[name].state == CLOSED and health[name].samples]
+                if stale:
+                    pick = min(stale, key=lambda name: health[name].last_sample_at)
+                    rest.remove(pick)
+                    rest.insert(0, pick)
+        return due + rest
+
+    def _explore_turn(self) -> bool:
+        with self._lock:
+            self._calls += 1
+            return self.explore_every > 0 and self._calls % self.explore_every == 0
+
+    def call_chain(self, content: str, chain: List[Tuple[str, ProviderFn]]) -> Dict[str, Any]:
+        """
+        Gọi lần lượt các provider theo thứ tự sức khỏe cho đến khi có url.
+        Kết quả có thêm `tried`: danh sách provider đã gọi. Lần gọi hỏng vì dòng hết thời gian
+        (chờ rate limit quá lâu, timeout bị rút ngắn) không được tính vào sức khỏe provider.
+        """
+        functions = dict(chain)
+        tried = []
+        errors = []
+        chain_misses = deadline.misses()
+        for name in self.order([name for name, _ in chain], explore=self._explore_turn()):
+            if deadline.expired():
+                break
+            if not self.acquire(name):
+                continue
+            tried.append(name)
+            started = time.monotonic()
+            misses = deadline.misses()
+            try:
+                result = functions[name](content)
+            except Exception as e:
+                result = {"error": f"{name} Exception: {e}"}
+            ok = "url" in result
+            elapsed = time.monotonic() - started
+            if ok or deadline.misses() == misses:
+                self.record(name, ok, elapsed)
+            else:
+                self.release(name)
+            telemetry.record_attempt(name, elapsed, ok, result.get("error"))
+            if ok:
+                result["tried"] = tried
+                return result
+            errors.append(f"{name}: {result.get('error', 'Unknown error')}")
+
+        if deadline.expired() or deadline.misses() > chain_misses:
+            errors.append("Hết thời gian cho dòng")
+            return {"error": " | ".join(errors), "tried": tried, "budget_exceeded": True}
+        if not tried:
+            return {"error": "Tất cả provider đang tạm ngưng (circuit open)", "tried": tried}
+        return {"error": " | ".join(errors), "tried": tried}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "provider": h.name,
+                    "state": h.state,
+                    "success_rate": round(h.success_rate, 3),
+                    "avg_latency_s": round(h.avg_latency, 3),
+                    "consecutive_failures": h.consecutive_failures,
+                    "score": round(h.score, 3),
+                }
+                for h in self._health.values()
+            ]
+
+
+# Dùng chung cho cả process để mọi batch thấy cùng tình trạng provider
+router = Router()
@@ -0,0 +1,392 @@
+import os
+import sys
+import time
+import uuid
+import socket
+import threading
+import subprocess
+import logging
+from typing import Dict, Any, List, Optional, Iterable, NamedTuple, Callable
+
+from journal import STATE_DIR, Journal, connect
+from cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái shard
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_SHARD_ROWS = 500
+# Worker phải gia hạn lease trong khoảng này, quá hạn thì shard được giao cho worker khác
+LEASE_SECONDS = 60.0
+# Một shard bị giao lại quá số lần này (worker chết liên tục) thì bỏ
+MAX_SHARD_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+
+
+class Shard(NamedTuple):
+    """Một khoảng dòng [start, stop) của batch được giao cho một worker"""
+    batch_id: str
+    idx: int
+    fhash: str
+    start: int
+    stop: int
+    attempts: int
+    created_at: float  # lúc tạo batch (time.time())
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardStore:
+    """
+    Hàng đợi shard trên SQLite, dùng chung giữa các process / máy (cùng RENTRY_STATE_DIR).
+    Nội dung đã kiểm tra + chuyển đổi của từng dòng nằm luôn trong store nên worker
+    không cần đọc file gốc; kết quả được ghi vào journal như khi chạy một process.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(STATE_DIR, "shards.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            " id TEXT PRIMARY KEY, file_hash TEXT NOT NULL, name TEXT NOT NULL,"
+            " total INTEGER NOT NULL, created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " batch_id TEXT NOT NULL, idx INTEGER NOT NULL, start INTEGER NOT NULL, stop INTEGER NOT NULL,"
+            " status TEXT NOT NULL, worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT, PRIMARY KEY (batch_id, idx));"
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " batch_id TEXT NOT NULL, row_idx INTEGER NOT NULL, content TEXT NOT NULL, valid INTEGER NOT NULL,"
+            " PRIMARY KEY (batch_id, row_idx));"
+        )
+
+    def create_batch(self, fhash: str, name: str, rows: Iterable, shard_rows: int = DEFAULT_SHARD_ROWS) -> str:
+        """
+        Ghi các dòng chờ đăng (idx, content, valid) vào store và chia thành shard
+        mỗi shard tối đa `shard_rows` dòng. Trả về id của batch.
+        """
+        batch_id = uuid.uuid4().hex[:8]
+        shard_rows = max(1, int(shard_rows))
+        shards = []
+        current: List = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in rows:
+                    current.append((batch_id, int(row[0]), row[1], 1 if row[2] else 0))
+                    if len(current) >= shard_rows:
+                        shards.append(self._insert_shard(batch_id, len(shards), current))
+                        current = []
+                if current:
+                    shards.append(self._insert_shard(batch_id, len(shards), current))
+                self._conn.execute(
+                    "INSERT INTO batches (id, file_hash, name, total, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (batch_id, fhash, name, sum(shards), time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Batch {batch_id}: {sum(shards)} dòng, {len(shards)} shard")
+        return batch_id
+
+    def _insert_shard(self, batch_id: str, idx: int, rows: List) -> int:
+        self._conn.executemany("INSERT INTO rows (batch_id, row_idx, content, valid) VALUES (?, ?, ?, ?)", rows)
+        # Shard theo khoảng chỉ số dòng; các dòng đã xong trong journal đã bị bỏ nên khoảng có thể thưa
+        self._conn.execute(
+            "INSERT INTO shards (batch_id, idx, start, stop, status) VALUES (?, ?, ?, ?, ?)",
+            (batch_id, idx, rows[0][1], rows[-1][1] + 1, QUEUED),
+        )
+        return len(rows)
+
+    def claim(self, worker: str, batch_id: Optional[str] = None) -> Optional[Shard]:
+        """Nhận một shard đang chờ (hoặc có lease đã hết hạn), None nếu không còn việc"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Shard bị giao lại quá nhiều lần thì đánh dấu lỗi
+                self._conn.execute(
+                    "UPDATE shards SET status = ?, error = 'worker chết quá nhiều lần'"
+                    " WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                    (FAILED, LEASED, now, MAX_SHARD_ATTEMPTS),
+                )
+                query = (
+                    "SELECT s.batch_id, s.idx, b.file_hash, s.start, s.stop, s.attempts, b.created_at FROM shards s"
+                    " JOIN batches b ON b.id = s.batch_id"
+                    " WHERE (s.status = ? OR (s.status = ? AND s.lease_until < ?))"
+                )
+                params: List[Any] = [QUEUED, LEASED, now]
+                if batch_id:
+                    query += " AND s.batch_id = ?"
+                    params.append(batch_id)
+                row = self._conn.execute(query + " ORDER BY b.created_at, s.idx LIMIT 1", params).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                shard = Shard(*row[:5], attempts=row[5] + 1, created_at=row[6])
+                self._conn.execute(
+                    "UPDATE shards SET status = ?, worker = ?, lease_until = ?, attempts = ?"
+                    " WHERE batch_id = ? AND idx = ?",
+                    (LEASED, worker, now + LEASE_SECONDS, shard.attempts, shard.batch_id, shard.idx),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info(f"{worker}: nhận shard {shard.batch_id}/{shard.idx} (dòng {shard.start}-{shard.stop - 1}, lần {shard.attempts})")
+        return shard
+
+    def rows(self, shard: Shard) -> List:
+        with self._lock:
+            return [
+                (row_idx, content, bool(valid))
+                for row_idx, content, valid in self._conn.execute(
+                    "SELECT row_idx, content, valid FROM rows WHERE batch_id = ? AND row_idx >= ? AND row_idx < ?"
+                    " ORDER BY row_idx",
+                    (shard.batch_id, shard.start, shard.stop),
+                )
+            ]
+
+    def _update(self, shard: Shard, worker: str, sql: str, params: tuple) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                sql + " WHERE batch_id = ? AND idx = ? AND worker = ? AND status = ?",
+                params + (shard.batch_id, shard.idx, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, shard: Shard, worker: str) -> bool:
+        """Gia hạn lease; False nếu shard đã bị giao cho worker khác"""
+        return self._update(shard, worker, "UPDATE shards SET lease_until = ?", (time.time() + LEASE_SECONDS,))
+
+    def complete(self, shard: Shard, worker: str) -> bool:
+        return self._update(shard, worker, "UPDATE shards SET status = ?, lease_until = NULL", (DONE,))
+
+    def release(self, shard: Shard, worker: str, error: str) -> bool:
+        """Trả shard về hàng đợi sau lỗi của worker (hoặc bỏ nếu đã thử đủ số lần)"""
+        status = FAILED if shard.attempts >= MAX_SHARD_ATTEMPTS else QUEUED
+        return self._update(shard, worker, "UPDATE shards SET status = ?, lease_until = NULL, error = ?",
+                            (status, error[:500]))
+
+    def release_worker(self, worker: str) -> int:
+        """Trả lại ngay mọi shard đang giữ bởi một worker đã chết (không chờ hết lease)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE shards SET lease_until = 0 WHERE worker = ? AND status = ?", (worker, LEASED)
+            )
+            return cursor.rowcount
+
+    def progress(self, batch_id: str) -> Dict[str, int]:
+        """Số shard theo trạng thái"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM shards WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ).fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, LEASED, DONE, FAILED)}
+
+    def claimable(self, batch_id: str) -> int:
+        """Số shard có thể nhận ngay (đang chờ hoặc có lease đã hết hạn)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM shards WHERE batch_id = ? AND (status = ? OR (status = ? AND lease_until < ?))",
+                (batch_id, QUEUED, LEASED, time.time()),
+            ).fetchone()[0]
+
+    def created_at(self, batch_id: str) -> float:
+        with self._lock:
+            return self._conn.execute("SELECT created_at FROM batches WHERE id = ?", (batch_id,)).fetchone()[0]
+
+    def failed_rows(self, batch_id: str) -> List:
+        """(chỉ số dòng, lỗi) của mọi dòng thuộc shard bị bỏ (FAILED); gọi trước drop()"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT r.row_idx, s.error FROM rows r JOIN shards s"
+                " ON s.batch_id = r.batch_id AND r.row_idx >= s.start AND r.row_idx < s.stop"
+                " WHERE r.batch_id = ? AND s.status = ? ORDER BY r.row_idx",
+                (batch_id, FAILED),
+            ).fetchall()
+
+    def finished(self, batch_id: str) -> bool:
+        counts = self.progress(batch_id)
+        return counts[QUEUED] == 0 and counts[LEASED] == 0
+
+    def drop(self, batch_id: str) -> None:
+        """Xóa nội dung các dòng của batch đã xong (kết quả vẫn nằm trong journal)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM rows WHERE batch_id = ?", (batch_id,))
+
+
+class _Heartbeat:
+    """Luồng gia hạn lease của shard trong lúc worker đang đăng"""
+
+    def __init__(self, store: ShardStore, shard: Shard, worker: str):
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(store, shard, worker), daemon=True)
+
+    def _run(self, store: ShardStore, shard: Shard, worker: str) -> None:
+        while not self._stop.wait(LEASE_SECONDS / 3):
+            if not store.heartbeat(shard, worker):
+                logger.warning(f"{worker}: mất lease shard {shard.batch_id}/{shard.idx}")
+                self.lost.set()
+                return
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(store: ShardStore, journal: Journal, cache: Optional[ResultCache] = None,
+               concurrency: int = 4, batch_id: Optional[str] = None, worker: Optional[str] = None,
+               wait: bool = False, verify_concurrency: int = 0) -> int:
+    """
+    Vòng lặp worker: nhận shard, đăng các dòng chưa có trong journal bằng pipeline thường,
+    đánh dấu xong rồi nhận shard tiếp. Hết việc thì thoát (hoặc chờ việc mới nếu `wait`).
+    Trả về số shard đã làm xong.
+    """
+    from pipeline import iter_results
+
+    worker = worker or worker_name()
+    completed = 0
+    while True:
+        shard = store.claim(worker, batch_id)
+        if shard is None:
+            if not wait:
+                return completed
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        # Shard giao lại sau khi worker trước chết: bỏ các dòng worker đó đã ghi journal trong batch này
+        # (không bỏ dòng lỗi từ lần chạy trước, batch tạo với --retry-failed để đăng lại chúng)
+        finished = journal.finished_rows(shard.fhash, since=shard.created_at) if shard.attempts > 1 else set()
+        rows = [row for row in store.rows(shard) if row[0] not in finished]
+        try:
+            with _Heartbeat(store, shard, worker) as heartbeat:
+                results = iter_results(rows, concurrency, journal=journal, fhash=shard.fhash, cache=cache,
+                                       verify_concurrency=verify_concurrency)
+                try:
+                    for _ in results:
+                        if heartbeat.lost.is_set():
+                            break
+                finally:
+                    results.close()
+        except Exception as e:
+            logger.exception(f"{worker}: lỗi ở shard {shard.batch_id}/{shard.idx}")
+            store.release(shard, worker, str(e))
+            continue
+        if not heartbeat.lost.is_set() and store.complete(shard, worker):
+            completed += 1
+
+
+def record_failed_shards(store: ShardStore, journal: Journal, batch_id: str, fhash: str) -> int:
+    """
+    Ghi dòng lỗi vào journal cho các dòng thuộc shard bị bỏ mà chưa worker nào ghi kết quả trong batch này,
+    để file kết quả vẫn đủ mọi dòng (và --retry-failed lần sau đăng lại chúng). Trả về số dòng đã ghi.
+    """
+    from pipeline import result_row
+
+    failed = store.failed_rows(batch_id)
+    if not failed:
+        return 0
+    done = journal.finished_rows(fhash, since=store.created_at(batch_id))
+    missing = [
+        (row_idx, result_row(row_idx, {"error": f"Shard bị bỏ: {error or 'worker chết quá nhiều lần'}"}))
+        for row_idx, error in failed if row_idx not in done
+    ]
+    journal.record_many(fhash, missing)
+    return len(missing)
+
+
+class Coordinator:
+    """
+    Chạy N process worker trên máy này cho một batch, thay worker chết và theo dõi
+    đến khi mọi shard xong. Worker trên máy khác chỉ cần chạy `cli.py worker`
+    với cùng RENTRY_STATE_DIR để cùng nhận shard.
+    """
+
+    def __init__(self, store: ShardStore, batch_id: str, workers: int, worker_args: Iterable[str] = (),
+                 max_restarts: Optional[int] = None):
+        self.store = store
+        self.batch_id = batch_id
+        self.workers = max(0, int(workers))
+        self.worker_args = list(worker_args)
+        self.max_restarts = self.workers * MAX_SHARD_ATTEMPTS if max_restarts is None else max_restarts
+        self.restarts = 0
+        self._spawned = 0
+        self._procs: Dict[str, subprocess.Popen] = {}
+
+    def _spawn(self) -> None:
+        worker = f"{worker_name()}-w{self._spawned}"
+        self._spawned += 1
+        cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+        argv = [sys.executable, cli, "worker", "--batch", self.batch_id, "--worker-id", worker] + self.worker_args
+        self._procs[worker] = subprocess.Popen(argv)
+        logger.info(f"Khởi động worker {worker} (pid {self._procs[worker].pid})")
+
+    def _reap(self) -> int:
+        """Bỏ các worker đã thoát, trả về số worker chết (mã thoát khác 0)"""
+        crashed = 0
+        for worker, proc in list(self._procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            del self._procs[worker]
+            if code != 0:
+                crashed += 1
+                released = self.store.release_worker(worker)
+                logger.warning(f"Worker {worker} thoát với mã {code}, trả lại {released} shard")
+        return crashed
+
+    def run(self, on_progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """Chạy đến khi batch xong, gọi `on_progress` với số shard theo trạng thái sau mỗi vòng"""
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while True:
+                crashed = self._reap()
+                progress = self.store.progress(self.batch_id)
+                if on_progress is not None:
+                    on_progress(progress)
+                if progress[QUEUED] == 0 and progress[LEASED] == 0:
+                    return progress
+                # Chỉ worker chết mới được thay và tính vào số lần khởi động lại
+                replace = min(crashed, self.max_restarts - self.restarts)
+                for _ in range(replace):
+                    self.restarts += 1
+                    self._spawn()
+                exhausted = self.restarts >= self.max_restarts
+                # Worker thoát bình thường khi hết shard để nhận (shard cuối còn đang chạy);
+                # chỉ khởi động thêm khi có shard nhận được trở lại (vd. lease của worker máy khác hết hạn)
+                claimable = self.store.claimable(self.batch_id)
+                if not exhausted:
+                    for _ in range(min(self.workers - len(self._procs), claimable)):
+                        self._spawn()
+                if not self._procs and self.workers and exhausted and (crashed or claimable):
+                    raise RuntimeError(f"Worker chết quá nhiều lần ({self.restarts} lần khởi động lại)")
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        for proc in self._procs.values():
+            proc.terminate()
+        for worker, proc in self._procs.items():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            self.store.release_worker(worker)
+        self._procs.clear()
+
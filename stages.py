@@ -0,0 +1,69 @@
+import os
+import logging
+from typing import Optional
+
+import pandas as pd
+
+from journal import state_subdir
+from markdown_text import convert_many, CONVERTER_VERSION
+from validation import ColumnValidation, validate_column, REASON_NULL
+
+logger = logging.getLogger(__name__)
+
+# Kết quả chuyển đổi lưu trên đĩa được giữ chừng này giây kể từ lần ghi
+STAGE_TTL = 7 * 24 * 3600
+
+
+def stage_key(fhash: str, convert: bool) -> str:
+    """Khóa của cột content đã chuẩn bị: hash file + tùy chọn chuyển đổi + phiên bản bộ chuyển đổi"""
+    return f"{fhash[:32]}-{'md' if convert else 'raw'}-v{CONVERTER_VERSION}"
+
+
+def _load(path: str) -> Optional[ColumnValidation]:
+    try:
+        frame = pd.read_parquet(path)
+    except ImportError:
+        return None
+    except Exception as e:
+        logger.warning(f"Không đọc được {path}, tính lại: {e}")
+        return None
+    reason = frame["reason"].astype(object)
+    reason[reason.isna()] = None
+    return ColumnValidation(content=frame["content"], valid=frame["valid"].astype(bool), reason=reason)
+
+
+def _save(path: str, prepared: ColumnValidation) -> None:
+    frame = pd.DataFrame({"content": prepared.content, "valid": prepared.valid, "reason": prepared.reason})
+    try:
+        frame.to_parquet(f"{path}.part", index=False)
+    except ImportError:
+        return  # không có pyarrow: chỉ cache trong bộ nhớ của phiên
+    os.replace(f"{path}.part", path)
+
+
+def prepare_column(series: pd.Series, fhash: Optional[str] = None, convert: bool = True,
+                   workers: Optional[int] = None) -> ColumnValidation:
+    """
+    Chuẩn bị cột content một lần cho preview, thống kê và vòng đăng bài: strip, chuyển đổi
+    Markdown (nếu chọn) rồi kiểm tra trên đúng nội dung sẽ được đăng.
+    Có `fhash` thì kết quả được lưu Parquet trong STATE_DIR/stages và dùng lại cho cùng file + tùy chọn.
+    `workers` được chuyển cho markdown_text.convert_many (1 = chạy tuần tự, không tạo process pool).
+    """
+    path = os.path.join(state_subdir("stages", STAGE_TTL), f"{stage_key(fhash, convert)}.parquet") if fhash else None
+    if path and os.path.exists(path):
+        prepared = _load(path)
+        if prepared is not None and len(prepared.content) == len(series):
+            logger.info(f"Dùng lại cột đã chuẩn bị {os.path.basename(path)}")
+            return prepared
+
+    raw = validate_column(series)
+    if not convert:
+        prepared = raw
+    else:
+        prepared = validate_column(pd.Series(convert_many(raw.content.tolist(), workers), dtype=object))
+        # Ô trống gốc vẫn báo là null thay vì chuỗi rỗng sau chuyển đổi
+        prepared.reason[raw.reason == REASON_NULL] = REASON_NULL
+
+    if path:
+        _save(path, prepared)
+    return prepared
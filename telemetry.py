@@ -0,0 +1,134 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+# Loại span được ghi cho mỗi dòng
+ATTEMPT = "attempt"    # một lần gọi provider trong chuỗi fallback
+REQUEST = "request"    # một HTTP request (kèm thời gian connect / chờ server)
+SLEEP = "sleep"        # thời gian ngủ giữa các lần thử
+RATE_WAIT = "rate_wait"  # thời gian chờ token bucket
+
+_local = threading.local()
+
+
+class RowTrace:
+    """Các span thời gian của một dòng, ghi từ mọi hàm đăng bài trên cùng thread"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._pending_connect = 0.0
+
+    def _offset(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def add(self, kind: str, provider: Optional[str], duration: float, **fields: Any) -> None:
+        span = {"kind": kind, "provider": provider, "at_ms": self._offset(), "duration_ms": round(duration * 1000, 2)}
+        span.update(fields)
+        self.spans.append(span)
+
+    def add_connect(self, duration: float) -> None:
+        # Kết nối được mở bên trong request, gộp vào span request kế tiếp
+        self._pending_connect += duration
+
+    def take_connect(self) -> float:
+        duration, self._pending_connect = self._pending_connect, 0.0
+        return duration
+
+    def summary(self) -> Dict[str, Any]:
+        """Các cột tổng hợp cho bảng kết quả"""
+        end = self.finished or time.perf_counter()
+        totals: Dict[str, float] = {}
+        summary = {
+            "total_ms": round((end - self.started) * 1000, 1),
+            "attempts": 0,
+            "connect_ms": 0.0,
+            "server_wait_ms": 0.0,
+            "sleep_ms": 0.0,
+            "rate_wait_ms": 0.0,
+        }
+        for span in self.spans:
+            kind = span["kind"]
+            if kind == ATTEMPT:
+                summary["attempts"] += 1
+                totals[span["provider"]] = totals.get(span["provider"], 0.0) + span["duration_ms"]
+            elif kind == REQUEST:
+                summary["connect_ms"] += span.get("connect_ms", 0.0)
+                summary["server_wait_ms"] += span.get("server_wait_ms", 0.0)
+            elif kind == SLEEP:
+                summary["sleep_ms"] += span["duration_ms"]
+            elif kind == RATE_WAIT:
+                summary["rate_wait_ms"] += span["duration_ms"]
+        for key in ("connect_ms", "server_wait_ms", "sleep_ms", "rate_wait_ms"):
+            summary[key] = round(summary[key], 1)
+        for provider, total in totals.items():
+            summary[f"ms_{provider}"] = round(total, 1)
+        return summary
+
+
+def current_trace() -> Optional[RowTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def trace_row() -> Iterator[RowTrace]:
+    """Gắn một RowTrace cho thread hiện tại trong lúc xử lý một dòng"""
+    previous = current_trace()
+    trace = RowTrace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        trace.finished = time.perf_counter()
+        _local.trace = previous
+
+
+def record_attempt(provider: str, duration: float, ok: bool, error: Optional[str] = None) -> None:
+    trace = current_trace()
+    if trace is not None:
+        trace.add(ATTEMPT, provider, duration, ok=ok, error=(error or "")[:200])
+
+
+def record_request(host: str, method: str, duration: float, status: Optional[int] = None,
+                   elapsed: Optional[float] = None, error: Optional[str] = None) -> None:
+    """
+    Ghi một HTTP request. `elapsed` là response.elapsed (gửi request -> nhận header),
+    phần còn lại sau khi trừ thời gian connect được tính là thời gian chờ server.
+    """
+    trace = current_trace()
+    if trace is not None:
+        connect = trace.take_connect()
+        server_wait = max(0.0, (elapsed or 0.0) - connect)
+        trace.add(
+            REQUEST, host, duration,
+            method=method,
+            status=status,
+            connect_ms=round(connect * 1000, 2),
+            server_wait_ms=round(server_wait * 1000, 2),
+            error=(error or "")[:200],
+        )
+
+
+def record_connect(duration: float) -> None:
+    trace = current_trace()
+    if trace is not None:
+        trace.add_connect(duration)
+
+
+def record_rate_wait(provider: str, duration: float) -> None:
+    trace = current_trace()
+    if trace is not None and duration > 0:
+        trace.add(RATE_WAIT, provider, duration)
+
+
+def traced_sleep(seconds: float, provider: Optional[str] = None) -> None:
+    """time.sleep có ghi lại vào span của dòng hiện tại"""
+    if seconds <= 0:
+        return
+    started = time.perf_counter()
+    time.sleep(seconds)
+    trace = current_trace()
+    if trace is not None:
+        trace.add(SLEEP, provider, time.perf_counter() - started)
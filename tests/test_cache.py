@@ -0,0 +1,53 @@
+"""
+Khóa theo content của ResultCache không được tăng mãi theo số content khác nhau,
+và số hit / miss của mỗi job được đếm riêng.
+"""
+import threading
+import time
+
+from cache import ResultCache, JobCache
+
+
+def make_post(calls):
+    def post(content):
+        calls.append(content)
+        time.sleep(0.01)
+        return {"url": f"https://x/{len(calls)}", "method": "dpaste"}
+    return post
+
+
+def test_key_locks_released(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+    for i in range(200):
+        cache.get_or_post(f"nội dung {i}", make_post(calls))
+    assert cache._key_locks == {}
+    assert len(calls) == 200
+
+
+def test_concurrent_duplicates_post_once(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_post("trùng", make_post(calls))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sum(1 for r in results if r.get("cached")) == 7
+    assert cache._key_locks == {}
+
+
+def test_job_cache_counts_per_job(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+    first, second = JobCache(cache), JobCache(cache)
+    first.get_or_post("a", make_post(calls))
+    first.get_or_post("b", make_post(calls))
+    second.get_or_post("a", make_post(calls))
+    first.get_or_post("a", make_post(calls))
+    assert first.stats() == {"hits": 1, "misses": 2}
+    assert second.stats() == {"hits": 1, "misses": 0}
+    assert (cache.hits, cache.misses) == (2, 2)
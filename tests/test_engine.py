@@ -0,0 +1,42 @@
+"""
+TokenBucket phải tôn trọng Retry-After kể cả khi provider không giới hạn tốc độ (rate = 0).
+"""
+import time
+
+import pytest
+
+import deadline
+from engine import TokenBucket, RateLimiter
+
+
+@pytest.mark.parametrize("rate", [0, 5.0])
+def test_defer_blocks_acquire(rate):
+    bucket = TokenBucket(rate, 5)
+    bucket.defer(0.2)
+    started = time.monotonic()
+    waited = bucket.acquire()
+    assert waited >= 0.15
+    assert time.monotonic() - started >= 0.15
+
+
+def test_unlimited_bucket_without_defer_does_not_wait():
+    bucket = TokenBucket(0)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+
+
+def test_defer_longer_than_budget_raises():
+    bucket = TokenBucket(0)
+    bucket.defer(5.0)
+    with pytest.raises(deadline.BudgetExceeded):
+        bucket.acquire(max_wait=0.1)
+
+
+def test_unknown_provider_honors_retry_after():
+    class Response:
+        status_code = 429
+        headers = {"Retry-After": "0.2"}
+
+    limiter = RateLimiter({})
+    assert limiter.honor_retry_after("khác", Response()) == pytest.approx(0.2)
+    assert limiter.bucket("khác").acquire() >= 0.15
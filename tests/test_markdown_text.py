@@ -0,0 +1,113 @@
+"""
+Kết quả của markdown_text phải giống hệt bộ chuyển đổi cũ (chuỗi re.sub trong rentry.py bản đầu),
+vì URL / cache / journal của các dòng đã đăng phụ thuộc vào nội dung sau chuyển đổi.
+"""
+import random
+import re
+
+import pytest
+
+import markdown_text
+from markdown_text import convert_markdown_to_plain_text, convert_many
+
+
+def baseline_convert(markdown_text: str) -> str:
+    """Bộ chuyển đổi cũ, giữ nguyên từng bước để làm chuẩn so sánh"""
+    if not markdown_text:
+        return markdown_text
+
+    text = markdown_text
+    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'\1 (\2)', text)
+    text = re.sub(r'(https?://[^\s]+)', r'(\1)', text)
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.*?)\*', r'\1', text)
+    text = re.sub(r'`(.*?)`', r'\1', text)
+    text = re.sub(r'#{1,6}\s*', '', text)
+    text = re.sub(r'^\s*[-*+]\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\d+\.\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+    return text.strip()
+
+
+GOLDEN = [
+    # link markdown
+    ("Xem [trang chủ](https://example.com) nhé", "Xem trang chủ ((https://example.com)) nhé"),
+    ("[a](x) và [b](y)", "a (x) và b (y)"),
+    ("[](empty) [text]()", "[](empty) [text]()"),
+    ("[**đậm trong link**](https://x.y/*z*)", "đậm trong link ((https://x.y/z))"),
+    # link trực tiếp
+    ("Link https://example.com/path?q=1 ở giữa", "Link (https://example.com/path?q=1) ở giữa"),
+    ("http://a.b và https://c.d/e", "(http://a.b) và (https://c.d/e)"),
+    ("ftp://not.matched", "ftp://not.matched"),
+    # đậm / nghiêng / code
+    ("**đậm** và *nghiêng*", "đậm và nghiêng"),
+    ("**chưa đóng", "chưa đóng"),
+    ("*a* *b* ***c***", "a b c"),
+    ("a * b * c", "a  b  c"),
+    ("dùng `code` và ``kép``", "dùng code và kép"),
+    ("*a**b**", "ab"),
+    ("a*b\nc*d*e", "a*b\ncde"),
+    ("`a` `b\n`c`", "a `b\nc"),
+    # header
+    ("# Tiêu đề\n## Mục\n###### Sáu\n####### Bảy", "Tiêu đề\nMục\nSáu\nBảy"),
+    ("giá #1 và C#", "giá 1 và C"),
+    # danh sách
+    ("- một\n* hai\n+ ba\n  - lồng", "một\nhai\nba\nlồng"),
+    ("1. một\n2. hai\n10. mười", "một\nhai\nmười"),
+    ("3.14 là pi\n  4. thụt lề", "14 là pi\nthụt lề"),
+    ("- 1. x", "x"),
+    ("1.\n- x", "x"),
+    ("1.  \n  + a.b", "a.b"),
+    ("1.\n- 2. x\n- - y", "x\n- y"),
+    ("-\n -\n- z", "-\nz"),
+    # dòng trống và khoảng trắng
+    ("a\n\n\n\nb\n \n \nc", "a\n\nb\n\nc"),
+    ("a\n\n b", "a\n\n b"),
+    ("  \n  khoảng trắng hai đầu  \n ", "khoảng trắng hai đầu"),
+    # kết hợp
+    ("- [mục](https://a.b) với **đậm**\n\n\n# Hết", "mục ((https://a.b)) với đậm\n\nHết"),
+    ("", ""),
+    ("văn bản thường không có gì", "văn bản thường không có gì"),
+]
+
+# Ký tự có ý nghĩa với các pattern, để sinh chuỗi ngẫu nhiên chạm tới mọi nhánh
+FUZZ_TOKENS = ["[", "]", "(", ")", "*", "**", "`", "#", "-", "+", ".", "1.", "12", " ", "  ", "\n", "\n\n",
+               "\t", "\xa0", "http://", "https://", "a.b", "chữ", "x", "ý", "\n- ", "\n1. ", " \n"]
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 40)))
+
+
+@pytest.mark.parametrize("source, expected", GOLDEN)
+def test_golden(source, expected):
+    assert baseline_convert(source) == expected
+    assert convert_markdown_to_plain_text(source) == expected
+
+
+def test_none_passthrough():
+    assert convert_markdown_to_plain_text(None) is None
+
+
+def test_matches_baseline_on_random_input():
+    rng = random.Random(20240501)
+    for _ in range(5000):
+        text = random_text(rng)
+        assert convert_markdown_to_plain_text(text) == baseline_convert(text), repr(text)
+
+
+def test_convert_many_keeps_order():
+    texts = [source for source, _ in GOLDEN] * 3
+    assert convert_many(texts, workers=1) == [baseline_convert(text) for text in texts]
+
+
+def test_convert_many_process_pool(monkeypatch, caplog):
+    monkeypatch.setattr(markdown_text, "PROCESS_POOL_MIN_ITEMS", 10)
+    monkeypatch.setattr(markdown_text, "PROCESS_POOL_CHUNKSIZE", 7)
+    rng = random.Random(7)
+    texts = [f"{i}. {random_text(rng)}" for i in range(200)]
+    with caplog.at_level("INFO", logger="markdown_text"):
+        converted = convert_many(texts, workers=2)
+    assert "trên 2 process" in caplog.text
+    assert "Process pool lỗi" not in caplog.text
+    assert converted == [baseline_convert(text) for text in texts]
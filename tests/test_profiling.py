@@ -0,0 +1,49 @@
+"""
+Hai lần chạy có profile cùng lúc (hai job) không được dừng tracemalloc / cProfile của nhau.
+"""
+import threading
+import time
+import tracemalloc
+import zipfile
+
+from profiling import RunProfiler
+
+
+def test_overlapping_profiles_are_serialized():
+    events = []
+    profilers = []
+    first_started = threading.Event()
+
+    def first():
+        with RunProfiler(interval=0.01):
+            events.append("first start")
+            first_started.set()
+            time.sleep(0.2)
+            events.append(("first tracing", tracemalloc.is_tracing()))
+
+    def second():
+        first_started.wait()
+        with RunProfiler(interval=0.01) as profiler:
+            events.append("second start")
+            data = [bytes(1000) for _ in range(1000)]
+            time.sleep(0.6)
+            events.append(("second tracing", tracemalloc.is_tracing()))
+            del data
+        profilers.append(profiler)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert events == ["first start", ("first tracing", True), "second start", ("second tracing", True)]
+    assert profilers[0].sampler.peak_bytes > 1_000_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_save_archive(tmp_path):
+    with RunProfiler(interval=0.01) as profiler:
+        sum(i * i for i in range(10000))
+    path = profiler.save(str(tmp_path / "profile.zip"))
+    names = zipfile.ZipFile(path).namelist()
+    assert {"summary.txt", "profile.txt", "profile.pstats", "stacks.collapsed"} <= set(names)
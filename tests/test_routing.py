@@ -0,0 +1,119 @@
+"""
+Router phải đưa provider ưu tiên (dpaste) trở lại đầu chuỗi sau khi nó hết sự cố,
+không để một lần lỗi thoáng qua hạ hạng nó suốt đời process.
+"""
+import types
+
+import pytest
+
+import routing
+from routing import Router, OPEN, CLOSED
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(routing, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+class FakeProvider:
+    def __init__(self, name: str):
+        self.name = name
+        self.up = True
+        self.calls = 0
+
+    def __call__(self, content: str):
+        self.calls += 1
+        if self.up:
+            return {"url": f"https://{self.name}/{self.calls}"}
+        return {"error": f"{self.name} down"}
+
+
+def make_chain():
+    providers = [FakeProvider(name) for name in ("dpaste", "rentry_api", "rentry_session", "selenium")]
+    return providers, [(p.name, p) for p in providers]
+
+
+def run_rows(router, chain, clock, rows, step=0.5):
+    for _ in range(rows):
+        clock.now += step
+        assert "url" in router.call_chain("nội dung", chain)
+
+
+def test_recovers_preferred_provider_after_outage(clock):
+    router = Router()
+    (dpaste, rentry_api, _, selenium), chain = make_chain()
+
+    dpaste.up = False
+    run_rows(router, chain, clock, 10)
+    dpaste.up = True
+    run_rows(router, chain, clock, 1000)
+
+    health = {row["provider"]: row for row in router.snapshot()}
+    assert router.order([name for name, _ in chain])[0] == "dpaste"
+    assert health["dpaste"]["success_rate"] > 0.9
+    assert dpaste.calls > 100
+    assert selenium.calls == 0
+    # Phần lớn các dòng cuối đã quay về dpaste
+    before = dpaste.calls
+    run_rows(router, chain, clock, 100)
+    assert dpaste.calls - before >= 95
+
+
+def test_stale_failure_fades(clock):
+    router = Router(explore_every=0)
+    (dpaste, rentry_api, _, _), chain = make_chain()
+
+    dpaste.up = False
+    run_rows(router, chain, clock, 1)
+    assert router.order([name for name, _ in chain])[0] == "rentry_api"
+
+    dpaste.up = True
+    clock.now += routing.SAMPLE_MAX_HALF_LIVES * routing.DEFAULT_HALF_LIFE
+    run_rows(router, chain, clock, 1)
+    assert router.order([name for name, _ in chain])[0] == "dpaste"
+
+
+def test_open_circuit_probed_first_after_cooldown(clock):
+    router = Router(failure_threshold=3, cooldown=60, explore_every=0)
+    (dpaste, rentry_api, _, _), chain = make_chain()
+    rentry_api.up = False
+
+    for _ in range(3):
+        clock.now += 1
+        router.record("rentry_api", False, 0.1)
+    health = {row["provider"]: row for row in router.snapshot()}
+    assert health["rentry_api"]["state"] == OPEN
+
+    run_rows(router, chain, clock, 5)
+    assert rentry_api.calls == 0
+
+    rentry_api.up = True
+    clock.now += 60
+    result = router.call_chain("nội dung", chain)
+    assert result["tried"] == ["rentry_api"]
+    health = {row["provider"]: row for row in router.snapshot()}
+    assert health["rentry_api"]["state"] == CLOSED
+
+
+def test_explore_refreshes_lower_ranked_provider(clock):
+    router = Router(explore_every=10)
+    (dpaste, rentry_api, _, selenium), chain = make_chain()
+
+    dpaste.up = False
+    run_rows(router, chain, clock, 1)
+    dpaste.up = True
+    calls = dpaste.calls
+    run_rows(router, chain, clock, 30)
+    # Mỗi 10 dòng có một dòng thử lại dpaste; provider chưa từng dùng (selenium) không bị gọi
+    assert dpaste.calls - calls == 3
+    assert selenium.calls == 0
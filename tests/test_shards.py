@@ -0,0 +1,63 @@
+"""
+Dòng của shard bị bỏ (worker chết liên tục) vẫn phải có mặt trong kết quả dưới dạng dòng lỗi,
+và worker nhận lại shard chỉ bỏ qua các dòng đã có kết quả trong chính batch đó.
+"""
+import time
+
+import shards
+from journal import Journal
+from shards import ShardStore, record_failed_shards, FAILED
+
+
+def make_store(tmp_path, rows=6, shard_rows=3):
+    store = ShardStore(str(tmp_path / "shards.sqlite3"))
+    journal = Journal(str(tmp_path / "journal.sqlite3"))
+    batch_id = store.create_batch("f", "in.csv", [(i, f"nội dung {i}", True) for i in range(rows)], shard_rows)
+    return store, journal, batch_id
+
+
+def crash(store, batch_id, worker="w"):
+    """Nhận shard đầu tiên rồi trả lại như worker chết, đến khi shard bị bỏ"""
+    while True:
+        shard = store.claim(worker, batch_id)
+        store.release(shard, worker, "worker chết")
+        if shard.attempts >= shards.MAX_SHARD_ATTEMPTS:
+            return shard
+
+
+def test_failed_shard_rows_recorded_as_errors(tmp_path):
+    store, journal, batch_id = make_store(tmp_path)
+    shard = crash(store, batch_id)
+    assert store.progress(batch_id)[FAILED] == 1
+    # Worker kịp đăng một dòng trước khi chết
+    journal.record("f", 1, {"row": 2, "url": "https://x/1"})
+
+    assert record_failed_shards(store, journal, batch_id, "f") == 2
+    results = list(journal.iter_results("f"))
+    assert [r["row"] for r in results] == [1, 2, 3]
+    assert results[1]["url"] == "https://x/1"
+    assert results[0]["url"] is None and "Shard bị bỏ" in results[0]["error"]
+    assert shard.stop == 3
+
+
+def test_errors_from_earlier_runs_not_counted_as_done(tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite3"))
+    journal.record("f", 0, {"row": 1, "error": "lỗi lần trước"})
+    since = time.time()
+    journal.record("f", 1, {"row": 2, "error": "lỗi trong batch"})
+    journal.record("f", 2, {"row": 3, "url": "https://x/3"})
+
+    assert journal.finished_rows("f") == {0, 1, 2}
+    assert journal.finished_rows("f", since=since) == {1, 2}
+
+
+def test_iter_results_pages_in_row_order(tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite3"))
+    for i in reversed(range(25)):
+        journal.record("f", i, {"row": i + 1, "error": "lỗi"})
+    journal.record("f", 7, {"row": 8, "url": "https://x/8"})
+
+    results = list(journal.iter_results("f", batch_size=4))
+    assert [r["row"] for r in results] == list(range(1, 26))
+    assert results[7]["url"] == "https://x/8"
+    assert [r["row"] for r in journal.iter_results("f", rows={3, 20}, batch_size=4)] == [4, 21]
@@ -0,0 +1,84 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+MIN_LENGTH = 3
+SENTINELS = ["nan", "null", "none", "undefined"]
+
+# Mã lý do dòng không hợp lệ
+REASON_NULL = "null"
+REASON_EMPTY = "empty"
+REASON_TOO_SHORT = "too_short"
+REASON_SENTINEL = "sentinel"
+
+REASON_LABELS = {
+    REASON_NULL: "Ô trống (null)",
+    REASON_EMPTY: "Chỉ có khoảng trắng",
+    REASON_TOO_SHORT: f"Ngắn hơn {MIN_LENGTH} ký tự",
+    REASON_SENTINEL: "Giá trị giữ chỗ (nan/null/none/undefined)",
+}
+
+
+def validate_content(content: str) -> bool:
+    """Kiểm tra content có hợp lệ không"""
+    if not content or content.strip() == "":
+        return False
+    # Giảm yêu cầu độ dài tối thiểu từ 10 xuống 3 ký tự
+    if len(content.strip()) < MIN_LENGTH:
+        return False
+    if content.lower() in SENTINELS:
+        return False
+    return True
+
+
+class ColumnValidation(NamedTuple):
+    """Kết quả kiểm tra cả cột content, dùng chung cho thống kê, bảng lỗi và vòng đăng bài"""
+    content: pd.Series   # content đã strip (ô null thành "")
+    valid: pd.Series     # mask bool
+    reason: pd.Series    # mã lý do, None nếu hợp lệ
+
+    @property
+    def valid_count(self) -> int:
+        return int(self.valid.sum())
+
+    @property
+    def invalid_count(self) -> int:
+        return len(self.valid) - self.valid_count
+
+    def invalid_table(self, preview_chars: int = 100) -> pd.DataFrame:
+        """Bảng các dòng không hợp lệ để debug"""
+        invalid = ~self.valid
+        content = self.content[invalid]
+        lengths = content.str.len()
+        shown = content.where(lengths <= preview_chars, content.str.slice(0, preview_chars) + "...")
+        return pd.DataFrame({
+            "Dòng": np.flatnonzero(invalid.to_numpy()) + 1,
+            "Content": shown.to_numpy(),
+            "Độ dài": lengths.to_numpy(),
+            "Lý do": self.reason[invalid].map(REASON_LABELS).to_numpy(),
+        })
+
+
+def validate_column(series: pd.Series) -> ColumnValidation:
+    """
+    Kiểm tra cả cột bằng phép toán chuỗi của pandas (cùng quy tắc với validate_content)
+    """
+    series = series.reset_index(drop=True)
+    is_null = series.isna()
+    content = series.astype(str).where(~is_null, "").str.strip()
+    lengths = content.str.len()
+    is_sentinel = content.str.lower().isin(SENTINELS)
+
+    reason = pd.Series(
+        np.select(
+            [is_null, lengths == 0, is_sentinel, lengths < MIN_LENGTH],
+            [REASON_NULL, REASON_EMPTY, REASON_SENTINEL, REASON_TOO_SHORT],
+            default="",
+        ),
+        index=series.index,
+        dtype=object,
+    )
+    reason[reason == ""] = None
+    valid = reason.isna()
+    return ColumnValidation(content=content, valid=valid, reason=reason)
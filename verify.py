@@ -0,0 +1,138 @@
+import gzip
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple, Callable
+
+import bundle
+from engine import PostingEngine
+from http_pool import http_pool
+from cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Số link được tải về kiểm tra song song
+DEFAULT_VERIFY_CONCURRENCY = 8
+# Số lần đăng lại một dòng có link sai nội dung
+VERIFY_REPOSTS = 1
+# Status cho thấy link không còn / không phải bài đã đăng (đăng lại); lỗi khác chỉ ghi nhận
+MISSING_STATUSES = (404, 410)
+
+
+def raw_url(result: Dict[str, Any]) -> Optional[str]:
+    """URL nội dung thô của bài đã đăng (bài gộp nếu dòng nằm trong bundle), theo provider trả về link"""
+    url = result.get("bundle_url") or result.get("url")
+    if not url:
+        return None
+    method = str(result.get("method") or "")
+    url = url.rstrip("/")
+    if method == "dpaste":
+        return f"{url}.txt"
+    if method.startswith("0x0.st"):
+        return url
+    if method == "pastebin":
+        base, _, paste_id = url.rpartition("/")
+        return f"{base}/raw/{paste_id}"
+    # rentry (API, session, form, selenium)
+    return f"{url}/raw"
+
+
+def normalize(text: str) -> str:
+    """Provider có thể đổi xuống dòng và thêm/bớt khoảng trắng ở hai đầu"""
+    return text.replace("\r\n", "\n").strip()
+
+
+class RawMemo:
+    """
+    Nội dung thô vừa tải theo URL: các dòng của cùng một bài gộp chỉ tải trang đó một lần,
+    dòng đến sau chờ dòng đang tải. Chỉ giữ `size` trang gần nhất.
+    """
+
+    def __init__(self, size: int = 32):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def get(self, url: str, fetch: Callable[[str], Tuple[Any, float]]) -> Tuple[Any, float]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                entry = self._entries[url] = [threading.Lock(), None]
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = fetch(url)
+            return entry[1]
+
+
+def fetch_raw(url: str, gzipped: bool = False) -> Tuple[Any, float]:
+    """(status, nội dung đã giải mã hoặc None, thời gian ms) hoặc (Exception, thời gian ms)"""
+    started = time.perf_counter()
+    try:
+        r = http_pool.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        if r.status_code != 200:
+            return (r.status_code, None), elapsed
+        data = gzip.decompress(r.content) if gzipped else r.content
+        # Tự giải mã UTF-8, requests đoán ISO-8859-1 với text/plain không có charset
+        return (200, data.decode("utf-8", "replace")), elapsed
+    except Exception as e:
+        return e, (time.perf_counter() - started) * 1000
+
+
+def verify_result(result: Dict[str, Any], content: str, memo: Optional[RawMemo] = None) -> Dict[str, Any]:
+    """
+    Tải nội dung thô của link và so hash với content đã đăng (dòng trong bài gộp: so phần của anchor).
+    Trả về các cột verified / verify_ms / verify_error và `repost` = link chắc chắn sai.
+    """
+    fetch = partial(fetch_raw, gzipped=str(result.get("method", "")).endswith("+gzip"))
+    url = raw_url(result)
+    fetched, elapsed = memo.get(url, fetch) if memo is not None else fetch(url)
+    if isinstance(fetched, Exception):
+        return {"verified": False, "verify_ms": elapsed, "verify_error": f"Exception: {fetched}", "repost": False}
+    status, text = fetched
+    if status != 200:
+        return {"verified": False, "verify_ms": elapsed, "verify_error": f"HTTP {status}",
+                "repost": status in MISSING_STATUSES}
+    if result.get("anchor"):
+        text = bundle.split_sections(text).get(result["anchor"], "")
+    if content_hash(normalize(text)) != content_hash(normalize(content)):
+        return {"verified": False, "verify_ms": elapsed, "verify_error": "Nội dung không khớp", "repost": True}
+    return {"verified": True, "verify_ms": elapsed, "verify_error": None, "repost": False}
+
+
+def check_row(pair: Tuple[Tuple, Dict[str, Any]], repost: Callable[[Tuple], Dict[str, Any]],
+              memo: Optional[RawMemo] = None) -> Dict[str, Any]:
+    """Kiểm tra một dòng đã đăng thành công, đăng lại tối đa VERIFY_REPOSTS lần nếu link sai"""
+    item, result = pair
+    if not result.get("url"):
+        return result
+    for attempt in range(VERIFY_REPOSTS + 1):
+        check = verify_result(result, item[1], memo)
+        wrong = check.pop("repost")
+        result = dict(result, **check)
+        if check["verified"] or not wrong or attempt == VERIFY_REPOSTS:
+            break
+        logger.warning(f"Dòng {item[0] + 1}: {result['url']} - {check['verify_error']}, đăng lại")
+        result = dict(repost(item), reposts=attempt + 1)
+        if not result.get("url"):
+            break
+    if result.get("url") and not result.get("verified"):
+        result["status"] = "⚠️ Chưa xác minh"
+    return result
+
+
+def iter_verified(posted: Iterable[Tuple[Tuple, Dict[str, Any]]],
+                  repost: Callable[[Tuple], Dict[str, Any]],
+                  concurrency: int = DEFAULT_VERIFY_CONCURRENCY) -> Iterator[Tuple[Tuple, Dict[str, Any]]]:
+    """
+    Kiểm tra song song (tối đa `concurrency` link) các cặp (dòng, kết quả) ngay khi vừa đăng xong,
+    yield lại (dòng, kết quả có thêm cột verified / verify_ms) theo thứ tự dòng.
+    Dòng bắt đầu bằng (chỉ số, content, ...); `repost(dòng)` đăng lại một dòng có link không chứa đúng nội dung.
+    """
+    engine = PostingEngine(partial(check_row, repost=repost, memo=RawMemo()), concurrency=concurrency)
+    for (item, _), result in engine.run(posted):
+        yield item, result